@@ -1,21 +1,28 @@
+const PIXEL = Buffer.from(
+  "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8/x8AAwMB/6X6ZQAAAABJRU5ErkJggg==",
+  "base64"
+);
+
+// tracking_server.py answers immediately and writes opens in the background,
+// so a short timeout is plenty; the pixel is served either way.
+const TRACKING_ENDPOINT =
+  process.env.TRACKING_ENDPOINT || "https://tawanda-workaday-biotechnologically.ngrok-free.dev/update_open";
+const TRACKING_TIMEOUT_MS = Number(process.env.TRACKING_TIMEOUT_MS || 1500);
+
 export default async function handler(req, res) {
   const { tid } = req.query;
 
   console.log("Pixel hit with TID:", tid);
 
-  const pixel = Buffer.from(
-    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8/x8AAwMB/6X6ZQAAAABJRU5ErkJggg==",
-    "base64"
-  );
-
   if (tid) {
-    const trackingEndpoint = "https://tawanda-workaday-biotechnologically.ngrok-free.dev/update_open?tid=" + encodeURIComponent(tid);
+    const trackingEndpoint = TRACKING_ENDPOINT + "?tid=" + encodeURIComponent(tid);
 
     console.log("Calling tracking endpoint:", trackingEndpoint);
 
     try {
       const response = await fetch(trackingEndpoint, {
-        headers: { "ngrok-skip-browser-warning": "true" }
+        headers: { "ngrok-skip-browser-warning": "true" },
+        signal: AbortSignal.timeout(TRACKING_TIMEOUT_MS)
       });
       console.log("Fetch response status:", response.status);
     } catch (err) {
@@ -24,6 +31,7 @@ export default async function handler(req, res) {
   }
 
   res.setHeader("Content-Type", "image/png");
-  res.setHeader("Content-Length", pixel.length);
-  res.status(200).send(pixel);
+  res.setHeader("Content-Length", PIXEL.length);
+  res.setHeader("Cache-Control", "no-store, no-cache, must-revalidate");
+  res.status(200).send(PIXEL);
 }
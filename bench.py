@@ -0,0 +1,305 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import sqlite3
+import asyncio
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+
+# =========================
+# Benchmark harness
+# =========================
+#
+# For each size: write a synthetic leads.csv, then run import_csv,
+# send_initial, run_followups and report in a fresh process against an
+# empty database and a local SMTP sink that accepts and discards
+# everything. Pacing is switched off (no per-provider spacing, no global
+# rate limit, no recipient send windows), so the numbers are the
+# pipeline's own throughput. Results go to a JSON file for comparing
+# versions.
+#
+#   python bench.py [sizes] [output.json]
+#   python bench.py 10000,100000 bench_results.json
+
+DEFAULT_SIZES = [10000]
+DEFAULT_OUTPUT = "bench_results.json"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROVIDERS = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com", "proton.me"]
+WORDS = ["bed", "sleep", "mattress", "pillow", "ai", "tech", "cloud", "data", "bot",
+         "local", "shop", "home", "city", "best", "get", "my", "smart", "hub", "pro", "zone"]
+TLDS = ["com", "net", "io", "ai", "co", "org"]
+FIRST_NAMES = ["Rahul", "Anita", "John", "Maria", "Wei", "Fatima", "Liam", "Olga", ""]
+
+
+# =========================
+# Synthetic leads
+# =========================
+
+def generate_leads(path, rows, seed=42):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["email", "domain_name", "first_name"])
+        for i in range(rows):
+            domain_name = "".join(rng.sample(WORDS, rng.randint(2, 3))) + "." + rng.choice(TLDS)
+            # a mix of big providers and one-off company domains
+            if rng.random() < 0.7:
+                email = f"lead{i}@{rng.choice(PROVIDERS)}"
+            else:
+                email = f"owner{i}@company{i % 5000}.example"
+            writer.writerow([email, domain_name, rng.choice(FIRST_NAMES)])
+
+
+# =========================
+# SMTP sink
+# =========================
+
+class SMTPSink:
+    # Minimal SMTP server on a background thread: speaks enough ESMTP for
+    # smtplib (EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT), counts
+    # messages and bytes and throws the content away.
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.messages = 0
+        self.bytes = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    async def _handle(self, reader, writer):
+        writer.write(b"220 bench sink ESMTP\r\n")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                verb = line[:4].upper()
+                if verb == b"DATA":
+                    writer.write(b"354 end with <CRLF>.<CRLF>\r\n")
+                    await writer.drain()
+                    size = 0
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk == b".\r\n":
+                            break
+                        size += len(chunk)
+                    self.messages += 1
+                    self.bytes += size
+                    writer.write(b"250 2.0.0 queued\r\n")
+                elif verb in (b"EHLO", b"HELO"):
+                    writer.write(b"250-bench\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+                elif verb == b"AUTH":
+                    writer.write(b"235 2.7.0 accepted\r\n")
+                elif verb == b"QUIT":
+                    writer.write(b"221 bye\r\n")
+                    await writer.drain()
+                    break
+                else:
+                    writer.write(b"250 ok\r\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=256))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+# =========================
+# Worker (one fresh process per size)
+# =========================
+
+def peak_rss_kb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _timed(name, func, count_unit, count_fn, results):
+    # the send actions reset the metrics registry themselves; the others
+    # are reset here so each stage reports only its own phases
+    from metrics import metrics
+    metrics.reset()
+    started = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - started
+    count = count_fn()
+    results[name] = {
+        "seconds": round(seconds, 4),
+        count_unit: count,
+        f"{count_unit}_per_sec": round(count / seconds, 1) if seconds else None,
+        "peak_rss_kb": peak_rss_kb(),
+        # per-phase latency breakdown for this stage (see metrics.py)
+        "metrics": metrics.summary(),
+    }
+
+
+def run_worker(csv_path, result_path):
+    # stdout is discarded by the parent; progress bars and per-send lines
+    # still run, as they would in production
+    import email_automation as ea
+    import db
+
+    ea.init_db()
+    results = {}
+
+    def lead_count():
+        return db.fetch_all("SELECT COUNT(*) FROM leads")[0][0]
+
+    def sent_count():
+        return db.fetch_all("SELECT COUNT(*) FROM outbox WHERE state = 'sent'")[0][0]
+
+    _timed("import_csv", lambda: ea.import_from_csv(csv_path), "rows", lead_count, results)
+
+    _timed("send_initial", ea.action_send_initial, "messages", sent_count, results)
+
+    # make every lead due now; every other one has opened, so the run is a
+    # mix of follow-ups and resends
+    signer = db.tracking_signer()
+    db.record_opens([(signer.sign(lead_id, "initial", 0), None)
+                     for (lead_id,) in db.fetch_all("SELECT id FROM leads WHERE id % 2 = 0")])
+    db.execute("UPDATE leads SET next_action_at = '2000-01-01' WHERE next_action_at IS NOT NULL")
+    initial_sent = sent_count()
+    _timed("run_followups", ea.action_run_followups, "messages",
+           lambda: sent_count() - initial_sent, results)
+
+    _timed("report", ea.action_generate_report, "rows", lead_count, results)
+
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+
+# =========================
+# Driver
+# =========================
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def bench_size(rows, sink, workdir):
+    csv_path = os.path.join(workdir, "leads.csv")
+    result_path = os.path.join(workdir, "result.json")
+    log_path = os.path.join(workdir, "worker.log")
+
+    started = time.perf_counter()
+    generate_leads(csv_path, rows)
+    generate_seconds = time.perf_counter() - started
+
+    env = dict(
+        os.environ,
+        DB_PATH=os.path.join(workdir, "bench.db"),
+        SMTP_HOST=sink.host,
+        SMTP_PORT=str(sink.port),
+        SMTP_EMAIL="bench@example.com",
+        SMTP_PASSWORD="bench",
+        SMTP_USE_TLS="0",
+        MAX_EMAILS_PER_RUN=str(rows),
+        DELAY_MIN_SECONDS="0",
+        DELAY_MAX_SECONDS="0",
+        GLOBAL_SENDS_PER_MINUTE="0",
+        SEND_WINDOW_START_HOUR="0",
+        SEND_WINDOW_END_HOUR="0",
+        PYTHONPATH=HERE + os.pathsep + os.environ.get("PYTHONPATH", ""),
+    )
+    messages_before = sink.messages
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "_worker", csv_path, result_path],
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    if proc.returncode != 0 or not os.path.exists(result_path):
+        with open(log_path, encoding="utf-8", errors="replace") as log:
+            tail = log.read()[-2000:]
+        raise RuntimeError(f"benchmark worker failed for {rows} rows:\n{tail}")
+
+    with open(result_path, encoding="utf-8") as f:
+        phases = json.load(f)
+    return {
+        "rows": rows,
+        "csv_bytes": os.path.getsize(csv_path),
+        "generate_seconds": round(generate_seconds, 4),
+        "sink_messages": sink.messages - messages_before,
+        "phases": phases,
+    }
+
+
+def run_benchmarks(sizes, output):
+    sink = SMTPSink().start()
+    report = {
+        "started_at": datetime.utcnow().isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": [],
+    }
+    try:
+        for rows in sizes:
+            workdir = tempfile.mkdtemp(prefix=f"bench_{rows}_")
+            try:
+                print(f"Benchmarking {rows} leads...")
+                run = bench_size(rows, sink, workdir)
+                report["runs"].append(run)
+                for name, phase in run["phases"].items():
+                    rate_key = next(k for k in phase if k.endswith("_per_sec"))
+                    print(f"  {name:<14} {phase['seconds']:>9.2f}s  {phase[rate_key] or 0:>10.0f} "
+                          f"{rate_key.replace('_per_sec', '/s'):<11} peak RSS {phase['peak_rss_kb'] / 1024:.0f} MB")
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        sink.stop()
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+def print_usage():
+    print("Usage:")
+    print("  python bench.py [sizes] [output.json]")
+    print("  e.g. python bench.py 10000,100000,1000000 bench_results.json")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "_worker":
+        run_worker(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print_usage()
+    else:
+        sizes = [int(s) for s in sys.argv[1].split(",")] if len(sys.argv) > 1 else DEFAULT_SIZES
+        output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_OUTPUT
+        run_benchmarks(sizes, output)
@@ -0,0 +1,205 @@
+import os
+import re
+import mailbox
+import imaplib
+from email import message_from_bytes
+from email.parser import BytesHeaderParser, HeaderParser
+from email.utils import getaddresses
+
+from reply_sync import ImapReplySync, UID_RE, FETCH_CHUNK
+
+
+# =========================
+# Bounce (DSN / NDR) parsing
+# =========================
+#
+# Standard delivery status notifications (multipart/report with a
+# message/delivery-status part) are read field by field. Anything else that
+# looks like a bounce is scanned as text: when the returned original is
+# attached, the failures are its recipients; otherwise only addresses on or
+# next to a line with a permanent (5xx / 5.x.x) status count, so a helpdesk
+# address elsewhere in the notice is not suppressed. Only permanent failures
+# are suppressed; 4.x.x "delayed" reports are ignored.
+
+BOUNCE_SENDERS = ("mailer-daemon@", "postmaster@")
+BOUNCE_SUBJECT_RE = re.compile(
+    r"undeliver|delivery status notification \(failure\)|mail delivery failed|"
+    r"returned mail|delivery has failed|failure notice",
+    re.IGNORECASE,
+)
+PERMANENT_RE = re.compile(r"\b(5\.\d{1,3}\.\d{1,3}|55[0-4])\b")
+ADDRESS_RE = re.compile(r"[A-Za-z0-9._%+'-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+# status codes that condemn the whole recipient domain, not one mailbox
+DOMAIN_STATUSES = ("5.1.2", "5.1.10")
+
+
+def looks_like_bounce(headers):
+    sender = (headers.get("From") or "").lower()
+    if any(marker in sender for marker in BOUNCE_SENDERS):
+        return True
+    content_type = (headers.get("Content-Type") or "").lower()
+    if "multipart/report" in content_type and "delivery-status" in content_type:
+        return True
+    return bool(BOUNCE_SUBJECT_RE.search(headers.get("Subject") or ""))
+
+
+def _strip_type(value):
+    # "rfc822; user@example.com" -> "user@example.com"
+    return value.split(";", 1)[-1].strip().strip("<>").lower()
+
+
+def _from_delivery_status(part):
+    failures = []
+    # block 0 is per-message, the rest are per-recipient
+    for block in part.get_payload()[1:]:
+        action = (block.get("Action") or "").strip().lower()
+        status = (block.get("Status") or "").strip()
+        recipient = block.get("Final-Recipient") or block.get("Original-Recipient")
+        if action != "failed" or not status.startswith("5") or not recipient:
+            continue
+        address = _strip_type(recipient)
+        diagnostic = " ".join((block.get("Diagnostic-Code") or status).split())
+        if status in DOMAIN_STATUSES:
+            failures.append((address.rsplit("@", 1)[-1], "domain", diagnostic))
+        else:
+            failures.append((address, "address", diagnostic))
+    return failures
+
+
+def _notification_text(msg):
+    # human-readable parts only; the returned original would name us
+    texts = []
+    for part in msg.walk():
+        if part.get_content_type() in ("message/rfc822", "text/rfc822-headers"):
+            break
+        if part.get_content_maintype() == "text":
+            payload = part.get_payload(decode=True) or b""
+            texts.append(payload.decode(part.get_content_charset() or "utf-8", errors="replace"))
+    return "\n".join(texts)
+
+
+def _original_recipients(msg):
+    # To/Cc of the returned original (full message or headers only), if any
+    for part in msg.walk():
+        content_type = part.get_content_type()
+        if content_type == "message/rfc822":
+            payload = part.get_payload()
+            headers = payload[0] if isinstance(payload, list) and payload else None
+        elif content_type == "text/rfc822-headers":
+            payload = part.get_payload(decode=True) or b""
+            headers = HeaderParser().parsestr(payload.decode("utf-8", errors="replace"))
+        else:
+            continue
+        if headers is not None:
+            values = headers.get_all("To", []) + headers.get_all("Cc", [])
+            return [address.lower() for _, address in getaddresses(values) if "@" in address]
+    return []
+
+
+def parse_bounce(raw, own_addresses=()):
+    # Returns [(value, kind, reason)] where kind is 'address' or 'domain'.
+    msg = message_from_bytes(raw)
+    for part in msg.walk():
+        if part.get_content_type() == "message/delivery-status":
+            return _from_delivery_status(part)
+
+    if not looks_like_bounce(msg):
+        return []
+    lines = _notification_text(msg).splitlines()
+    permanent = [i for i, line in enumerate(lines) if PERMANENT_RE.search(line)]
+    if not permanent:
+        return []
+    reason = " ".join(lines[permanent[0]].split())
+
+    candidates = _original_recipients(msg)
+    if not candidates:
+        near = sorted({j for i in permanent for j in (i - 1, i, i + 1) if 0 <= j < len(lines)})
+        candidates = [a.lower() for j in near for a in ADDRESS_RE.findall(lines[j])]
+    own = {a.lower() for a in own_addresses if a}
+    failures = []
+    for address in dict.fromkeys(candidates):
+        if address not in own and not address.startswith(BOUNCE_SENDERS):
+            failures.append((address, "address", reason))
+    return failures
+
+
+def iter_bounce_files(path):
+    # Yields raw message bytes from a .eml file, an mbox file or a directory
+    # of .eml files.
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".eml"):
+                with open(os.path.join(path, name), "rb") as f:
+                    yield f.read()
+        return
+    with open(path, "rb") as f:
+        is_mbox = f.read(5) == b"From "
+    if is_mbox:
+        for message in mailbox.mbox(path):
+            yield message.as_bytes()
+    else:
+        with open(path, "rb") as f:
+            yield f.read()
+
+
+# =========================
+# IMAP bounce sync
+# =========================
+
+class ImapBounceSync(ImapReplySync):
+    # Same incremental UID walk as the reply sync, with its own watermark.
+    # Headers are fetched for every new message; full bodies only for the
+    # ones that look like bounces.
+    watermark_prefix = "imap_bounce_uid"
+    header_fields = "FROM SUBJECT CONTENT-TYPE"
+
+    def _bounce_uids(self, conn, uids):
+        parser = BytesHeaderParser()
+        for start in range(0, len(uids), FETCH_CHUNK):
+            uid_set = ",".join(str(uid) for uid in uids[start:start + FETCH_CHUNK])
+            typ, data = conn.uid("FETCH", uid_set, f"(UID BODY.PEEK[HEADER.FIELDS ({self.header_fields})])")
+            if typ != "OK":
+                raise imaplib.IMAP4.error(f"UID FETCH failed: {data!r}")
+            for item in data:
+                if isinstance(item, tuple):
+                    match = UID_RE.search(item[0])
+                    if match and looks_like_bounce(parser.parsebytes(item[1])):
+                        yield int(match.group(1))
+
+    def _fetch_bodies(self, conn, uids):
+        for uid in uids:
+            typ, data = conn.uid("FETCH", str(uid), "(BODY.PEEK[])")
+            if typ != "OK":
+                raise imaplib.IMAP4.error(f"UID FETCH {uid} failed: {data!r}")
+            for item in data:
+                if isinstance(item, tuple):
+                    yield item[1]
+
+    def sync(self, get_state, record, own_addresses=()):
+        # record(failures, watermarks) -> number of suppressions added
+        # Returns (bounces parsed, suppressions added).
+        failures = []
+        bounces = 0
+        watermarks = []
+
+        conn = self._connect()
+        try:
+            for folder in self.folders:
+                pending = self._pending(conn, folder, get_state)
+                if pending is None:
+                    continue
+                uids, watermark = pending
+                for raw in self._fetch_bodies(conn, list(self._bounce_uids(conn, uids))):
+                    bounces += 1
+                    failures.extend(parse_bounce(raw, own_addresses))
+                watermarks.append(watermark)
+        finally:
+            try:
+                conn.logout()
+            except Exception:
+                pass
+
+        if not watermarks:
+            return 0, 0
+        return bounces, record(failures, watermarks)
@@ -0,0 +1,84 @@
+import signal
+import threading
+import time
+import traceback
+
+
+# =========================
+# In-process task scheduler
+# =========================
+#
+# Runs a handful of periodic tasks one at a time on the main thread. Each
+# task runs to completion and then reports when it next wants to run (or
+# falls back to its interval). Between tasks the loop sleeps until the next
+# one is due, waking every poll_seconds to ask `changed()` whether new work
+# has appeared; tasks registered with wake_on_change are then run at once.
+# SIGTERM/SIGINT ask the loop to stop: the task in progress is told via
+# `on_stop` callbacks and no further task is started.
+
+class Task:
+    __slots__ = ("name", "func", "interval", "wake_on_change", "next_run")
+
+    def __init__(self, name, func, interval, wake_on_change=False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.wake_on_change = wake_on_change
+        self.next_run = 0.0
+
+
+class Daemon:
+    def __init__(self, poll_seconds=5.0, changed=None):
+        self.poll_seconds = poll_seconds
+        self.changed = changed
+        self.tasks = []
+        self.stopping = threading.Event()
+        self._on_stop = []
+
+    def add(self, name, func, interval, wake_on_change=False):
+        # func() -> seconds until it next wants to run, or None for `interval`
+        self.tasks.append(Task(name, func, interval, wake_on_change))
+
+    def on_stop(self, callback):
+        self._on_stop.append(callback)
+
+    def stop(self, *_):
+        if self.stopping.is_set():
+            return
+        print("\nStopping: finishing in-flight work...")
+        self.stopping.set()
+        for callback in self._on_stop:
+            callback()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def _wake(self, now):
+        for task in self.tasks:
+            if task.wake_on_change:
+                task.next_run = min(task.next_run, now)
+
+    def _run_task(self, task):
+        started = time.monotonic()
+        try:
+            delay = task.func()
+        except Exception:
+            print(f"\nTask {task.name} failed; retrying in {task.interval}s.")
+            traceback.print_exc()
+            delay = None
+        if delay is None:
+            delay = task.interval
+        task.next_run = started + max(delay, 0)
+
+    def run(self):
+        while not self.stopping.is_set():
+            task = min(self.tasks, key=lambda t: t.next_run)
+            wait = task.next_run - time.monotonic()
+            if wait > 0:
+                if self.stopping.wait(min(wait, self.poll_seconds)):
+                    break
+                if self.changed is not None and self.changed():
+                    self._wake(time.monotonic())
+                continue
+            self._run_task(task)
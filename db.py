@@ -0,0 +1,1277 @@
+import os
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from metrics import metrics
+from send_windows import infer_timezone
+from tracking_tokens import TokenSigner
+
+
+# =========================
+# Shared SQLite data-access layer
+# =========================
+#
+# One long-lived connection per process, shared by the sender CLI and the
+# open-tracking app. WAL lets the tracker write while a send run is reading
+# and writing, and sqlite3's statement cache means the hot queries below are
+# only prepared once per process.
+
+DB_PATH = os.getenv("DB_PATH", "emails.db")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 16384))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHED_STATEMENTS = 256
+
+# follow-up policy; next_action/next_action_at are derived from these
+RESEND_MAIN_AFTER_DAYS = 2
+FOLLOWUP_AFTER_DAYS = 4
+MAX_FOLLOWUPS = 4  # you can adjust this
+
+# strftime format that sorts together with datetime.isoformat() strings
+SQL_ISO_FORMAT = "%Y-%m-%dT%H:%M:%f"
+# every write to a lead stamps updated_at, which incremental reports key on
+SQL_NOW = f"strftime('{SQL_ISO_FORMAT}', 'now')"
+
+_conn = None
+_conn_pid = None
+_lock = threading.RLock()
+
+
+def _open_connection():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # autocommit; multi-statement work uses transaction()
+        check_same_thread=False,
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+    )
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def get_connection():
+    global _conn, _conn_pid
+    with _lock:
+        # a forked child must not reuse the parent's connection
+        if _conn is None or _conn_pid != os.getpid():
+            _conn = _open_connection()
+            _conn_pid = os.getpid()
+        return _conn
+
+
+def close_connection():
+    global _conn
+    with _lock:
+        if _conn is not None and _conn_pid == os.getpid():
+            _conn.close()
+        _conn = None
+
+
+@contextmanager
+def transaction():
+    with metrics.timer("sqlite_transaction"), _lock:
+        conn = get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def execute(sql, params=()):
+    with metrics.timer("sqlite_query"), _lock:
+        return get_connection().execute(sql, params)
+
+
+def fetch_all(sql, params=()):
+    with metrics.timer("sqlite_query"), _lock:
+        return get_connection().execute(sql, params).fetchall()
+
+
+# =========================
+# Schema
+# =========================
+
+def init_db():
+    execute("""
+        CREATE TABLE IF NOT EXISTS leads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL,
+            domain_name TEXT NOT NULL,
+            first_name TEXT,
+            vertical TEXT,
+            template_index INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'new',
+            opened INTEGER NOT NULL DEFAULT 0,
+            replied INTEGER NOT NULL DEFAULT 0,
+            last_email_sent_at TEXT,
+            followup_count INTEGER NOT NULL DEFAULT 0,
+            tracking_id TEXT
+        );
+    """)
+    migrate()
+
+
+# =========================
+# Migrations
+# =========================
+#
+# Each entry upgrades the schema by one step; PRAGMA user_version records how
+# many have been applied, so existing emails.db files are brought up to date
+# the next time any command runs.
+
+def _migration_1_lead_indexes(conn):
+    # older databases may hold the same tracking_id twice (same email added
+    # within one second); keep the first and make the rest unique
+    conn.execute("""
+        UPDATE leads
+        SET tracking_id = tracking_id || '-' || id
+        WHERE id NOT IN (SELECT MIN(id) FROM leads GROUP BY tracking_id)
+          AND tracking_id IS NOT NULL
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_leads_tracking_id ON leads(tracking_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_email_lower ON leads(lower(email))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_new ON leads(id) WHERE status = 'new'")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_followup ON leads(followup_count)
+        WHERE replied = 0 AND status IN ('initial_sent', 'followup')
+    """)
+
+
+def _migration_2_next_action(conn):
+    # next_action is 'resend' or 'followup'; NULL once the lead needs nothing
+    # more (replied, or out of follow-ups). Backfilled from the old rules.
+    conn.execute("ALTER TABLE leads ADD COLUMN next_action TEXT")
+    conn.execute("ALTER TABLE leads ADD COLUMN next_action_at TEXT")
+    conn.execute(f"""
+        UPDATE leads
+        SET next_action = CASE WHEN opened = 1 THEN 'followup' ELSE 'resend' END,
+            next_action_at = CASE
+                WHEN last_email_sent_at IS NULL THEN '1970-01-01T00:00:00'
+                WHEN opened = 1 THEN strftime('{SQL_ISO_FORMAT}', last_email_sent_at, '+{FOLLOWUP_AFTER_DAYS} days')
+                ELSE strftime('{SQL_ISO_FORMAT}', last_email_sent_at, '+{RESEND_MAIN_AFTER_DAYS} days')
+            END
+        WHERE replied = 0
+          AND status IN ('initial_sent', 'followup')
+          AND followup_count < {MAX_FOLLOWUPS}
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_leads_followup")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_next_action_at ON leads(next_action_at)
+        WHERE next_action_at IS NOT NULL
+    """)
+
+
+def _migration_3_last_message_id(conn):
+    conn.execute("ALTER TABLE leads ADD COLUMN last_message_id TEXT")
+
+
+def _migration_4_open_events(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS open_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tracking_id TEXT NOT NULL,
+            opened_at TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT 'pixel',
+            UNIQUE (tracking_id, opened_at)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    conn.execute("ALTER TABLE leads ADD COLUMN open_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE leads ADD COLUMN first_opened_at TEXT")
+    conn.execute("ALTER TABLE leads ADD COLUMN last_opened_at TEXT")
+    # opens recorded before the log existed count once, with no timestamp
+    conn.execute("UPDATE leads SET open_count = 1 WHERE opened = 1")
+
+
+def _migration_5_updated_at(conn):
+    conn.execute("ALTER TABLE leads ADD COLUMN updated_at TEXT")
+    conn.execute("""
+        UPDATE leads
+        SET updated_at = MAX(COALESCE(last_email_sent_at, ''), COALESCE(last_opened_at, ''))
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_updated_at ON leads(updated_at)")
+
+
+def _migration_6_outbox(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            lead_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            sequence INTEGER NOT NULL,
+            to_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body_html TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_until TEXT,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            sent_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(state, id)
+        WHERE state IN ('queued', 'sending')
+    """)
+
+
+def _migration_7_message_id_lookup(conn):
+    # reply sync matches In-Reply-To/References against sent Message-IDs
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_message_id ON outbox(message_id)")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_last_message_id ON leads(last_message_id)
+        WHERE last_message_id IS NOT NULL
+    """)
+
+
+def _migration_8_suppression(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS suppression (
+            value TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            reason TEXT,
+            source TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+
+def _migration_9_lead_leases(conn):
+    conn.execute("ALTER TABLE leads ADD COLUMN claimed_by TEXT")
+    conn.execute("ALTER TABLE leads ADD COLUMN lease_until TEXT")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_claimed_by ON leads(claimed_by)
+        WHERE claimed_by IS NOT NULL
+    """)
+
+
+def _migration_10_sender_accounts(conn):
+    # which mailbox a lead (and each outbox row) is sent from, and how many
+    # messages each mailbox sent per hour for quota accounting
+    conn.execute("ALTER TABLE leads ADD COLUMN sender_account TEXT")
+    conn.execute("ALTER TABLE outbox ADD COLUMN sender_account TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sender_sends (
+            account TEXT NOT NULL,
+            hour TEXT NOT NULL,
+            sent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (account, hour)
+        ) WITHOUT ROWID
+    """)
+
+
+def _migration_11_timezones(conn):
+    # recipient timezone ('' when unknown) for local-time send windows;
+    # existing leads get a guess from their address's country TLD
+    conn.execute("ALTER TABLE leads ADD COLUMN timezone TEXT NOT NULL DEFAULT ''")
+    conn.create_function("infer_timezone", 1, infer_timezone, deterministic=True)
+    conn.execute("UPDATE leads SET timezone = infer_timezone(email)")
+    # the due-lead queries filter on the zones whose window is open
+    conn.execute("DROP INDEX IF EXISTS idx_leads_new")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_new_timezone ON leads(timezone, id) WHERE status = 'new'")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_timezone_next_action ON leads(timezone, next_action_at)
+        WHERE next_action_at IS NOT NULL
+    """)
+
+
+def _migration_12_message_opens(conn):
+    # opens from signed tracking tokens name the lead and the exact message;
+    # the outbox row of that message keeps its own open counters
+    conn.execute("ALTER TABLE open_events ADD COLUMN lead_id INTEGER")
+    conn.execute("ALTER TABLE open_events ADD COLUMN kind TEXT")
+    conn.execute("ALTER TABLE open_events ADD COLUMN sequence INTEGER")
+    conn.execute("ALTER TABLE outbox ADD COLUMN open_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE outbox ADD COLUMN first_opened_at TEXT")
+    conn.execute("ALTER TABLE outbox ADD COLUMN last_opened_at TEXT")
+
+
+def _migration_13_generic_cctld_timezones(conn):
+    # .co addresses were once guessed to be in Colombia; most are startups
+    # anywhere, so forget that guess
+    conn.execute("""
+        UPDATE leads SET timezone = ''
+        WHERE timezone = 'America/Bogota' AND lower(email) LIKE '%.co'
+    """)
+
+
+MIGRATIONS = [
+    _migration_1_lead_indexes,
+    _migration_2_next_action,
+    _migration_3_last_message_id,
+    _migration_4_open_events,
+    _migration_5_updated_at,
+    _migration_6_outbox,
+    _migration_7_message_id_lookup,
+    _migration_8_suppression,
+    _migration_9_lead_leases,
+    _migration_10_sender_accounts,
+    _migration_11_timezones,
+    _migration_12_message_opens,
+    _migration_13_generic_cctld_timezones,
+]
+
+
+def migrate():
+    version = fetch_all("PRAGMA user_version")[0][0]
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        with transaction() as conn:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+        print(f"Applied database migration {number} ({step.__name__}).")
+
+
+# =========================
+# Leads
+# =========================
+#
+# Lead queries hand back small records with named fields instead of
+# positional tuples. The column lists below are built from each record's
+# __slots__, so a field added to a record is selected everywhere it is
+# used. Selections are streamed from their own cursor in chunks of
+# LEAD_CHUNK_SIZE rather than fetched all at once.
+
+LEAD_CHUNK_SIZE = int(os.getenv("LEAD_CHUNK_SIZE", 1000))
+
+
+class LeadRecord:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def columns(cls):
+        return ", ".join(cls.__slots__)
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        return cls(*row)
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class InitialLead(LeadRecord):
+    # a lead due for its first email
+    __slots__ = ("id", "email", "domain_name", "first_name", "vertical", "template_index",
+                 "tracking_id")
+
+
+class FollowupLead(LeadRecord):
+    # a lead due for a resend or a follow-up
+    __slots__ = ("id", "email", "domain_name", "first_name", "vertical", "status", "opened",
+                 "replied", "last_email_sent_at", "followup_count", "tracking_id", "next_action")
+
+
+def iter_records(sql, params, record, chunk_size=None):
+    # Streams `record` instances from a dedicated cursor, chunk_size rows at
+    # a time; only one chunk is ever held in memory.
+    chunk_size = chunk_size or LEAD_CHUNK_SIZE
+    with _lock:
+        cur = get_connection().cursor()
+        cur.row_factory = record.row_factory
+        cur.execute(sql, params)
+    try:
+        while True:
+            with metrics.timer("sqlite_query"), _lock:
+                rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+
+INSERT_LEAD_SQL = f"""
+    INSERT INTO leads (email, domain_name, first_name, vertical, template_index, tracking_id,
+                       timezone, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, {SQL_NOW})
+"""
+
+
+def insert_lead(email, domain_name, first_name, vertical, template_index, tracking_id, timezone=""):
+    try:
+        execute(INSERT_LEAD_SQL, (email, domain_name, first_name, vertical, template_index, tracking_id,
+                                  timezone))
+    except Exception as e:
+        print(f"Error inserting lead {email}: {e}")
+
+
+def insert_leads(rows):
+    # rows: (email, domain_name, first_name, vertical, template_index, tracking_id, timezone)
+    # Returns the number of leads inserted.
+    if not rows:
+        return 0
+    try:
+        with transaction() as conn:
+            conn.executemany(INSERT_LEAD_SQL, rows)
+        return len(rows)
+    except Exception as e:
+        print(f"\nError inserting batch of {len(rows)} leads: {e}")
+    # fall back to one lead at a time so a bad row can't sink the rest
+    inserted = 0
+    for row in rows:
+        try:
+            with transaction() as conn:
+                conn.execute(INSERT_LEAD_SQL, row)
+            inserted += 1
+        except Exception as e:
+            print(f"Error inserting lead {row[0]}: {e}")
+    return inserted
+
+
+# A lead is due when its timezone's send window is open (:zones is a JSON
+# list of open zones, see send_windows.py), nothing else holds a live lease
+# on it and its next message has not already failed permanently in the
+# outbox.
+INITIAL_DUE_WHERE = """
+    status = 'new'
+    AND timezone IN (SELECT value FROM json_each(:zones))
+    AND (lease_until IS NULL OR lease_until < :now)
+    AND NOT EXISTS (SELECT 1 FROM outbox
+                    WHERE idempotency_key = 'lead:' || leads.id || ':initial:0'
+                      AND state = 'failed')
+"""
+
+FOLLOWUP_DUE_WHERE = """
+    next_action_at IS NOT NULL
+    AND timezone IN (SELECT value FROM json_each(:zones))
+    AND next_action_at <= :now
+    AND (lease_until IS NULL OR lease_until < :now)
+    AND NOT EXISTS (SELECT 1 FROM outbox
+                    WHERE idempotency_key = 'lead:' || leads.id || ':' || leads.next_action
+                                            || ':' || (leads.followup_count + 1)
+                      AND state = 'failed')
+"""
+
+INITIAL_COLUMNS = InitialLead.columns()
+FOLLOWUP_COLUMNS = FollowupLead.columns()
+
+INITIAL_SEND_SQL = f"""
+    SELECT {INITIAL_COLUMNS}
+    FROM leads
+    WHERE {INITIAL_DUE_WHERE}
+    LIMIT :limit
+"""
+
+FOLLOWUP_SQL = f"""
+    SELECT {FOLLOWUP_COLUMNS}
+    FROM leads
+    WHERE {FOLLOWUP_DUE_WHERE}
+    ORDER BY next_action_at
+    LIMIT :limit
+"""
+
+# Claim a batch in one statement: the inner SELECT picks due, unleased
+# leads and the UPDATE stamps them with this worker's lease. SQLite runs
+# one writer at a time, so two workers can never claim the same lead.
+CLAIM_INITIAL_SQL = f"""
+    UPDATE leads
+    SET claimed_by = :owner, lease_until = :lease_until
+    WHERE id IN (SELECT id FROM leads WHERE {INITIAL_DUE_WHERE} LIMIT :limit)
+    RETURNING {INITIAL_COLUMNS}
+"""
+
+CLAIM_FOLLOWUP_SQL = f"""
+    UPDATE leads
+    SET claimed_by = :owner, lease_until = :lease_until
+    WHERE id IN (SELECT id FROM leads WHERE {FOLLOWUP_DUE_WHERE} ORDER BY next_action_at LIMIT :limit)
+    RETURNING {FOLLOWUP_COLUMNS}
+"""
+
+# Folds open_events with low < id <= high into the leads they belong to. An
+# open turns a pending resend into a follow-up, timed from the last send.
+# Events carry their lead id; rows logged before they did are matched by
+# tracking_id.
+APPLY_OPEN_EVENTS_SQL = f"""
+    WITH events AS (
+        SELECT COALESCE(e.lead_id, (SELECT id FROM leads WHERE leads.tracking_id = e.tracking_id)) AS lead_id,
+               e.opened_at
+        FROM open_events e
+        WHERE e.id > :low AND e.id <= :high
+    ),
+    batch AS (
+        SELECT lead_id, COUNT(*) AS n, MIN(opened_at) AS first_at, MAX(opened_at) AS last_at
+        FROM events
+        WHERE lead_id IS NOT NULL
+        GROUP BY lead_id
+    )
+    UPDATE leads
+    SET opened = 1,
+        updated_at = {SQL_NOW},
+        open_count = open_count + batch.n,
+        first_opened_at = COALESCE(MIN(first_opened_at, batch.first_at), batch.first_at),
+        last_opened_at = COALESCE(MAX(last_opened_at, batch.last_at), batch.last_at),
+        next_action = CASE WHEN next_action = 'resend' THEN 'followup' ELSE next_action END,
+        next_action_at = CASE
+            WHEN next_action = 'resend'
+            THEN strftime('{SQL_ISO_FORMAT}', last_email_sent_at, '+{FOLLOWUP_AFTER_DAYS} days')
+            ELSE next_action_at
+        END
+    FROM batch
+    WHERE leads.id = batch.lead_id
+"""
+
+# Same window, per message: opens from signed tokens are credited to the
+# outbox row of the email that was opened.
+APPLY_MESSAGE_OPENS_SQL = """
+    WITH batch AS (
+        SELECT 'lead:' || lead_id || ':' || kind || ':' || sequence AS idempotency_key,
+               COUNT(*) AS n, MIN(opened_at) AS first_at, MAX(opened_at) AS last_at
+        FROM open_events
+        WHERE id > :low AND id <= :high AND kind IS NOT NULL
+        GROUP BY 1
+    )
+    UPDATE outbox
+    SET open_count = open_count + batch.n,
+        first_opened_at = COALESCE(MIN(first_opened_at, batch.first_at), batch.first_at),
+        last_opened_at = COALESCE(MAX(last_opened_at, batch.last_at), batch.last_at)
+    FROM batch
+    WHERE outbox.idempotency_key = batch.idempotency_key
+"""
+
+MARK_REPLIED_SQL = f"""
+    UPDATE leads
+    SET replied = 1, status = 'replied', next_action = NULL, next_action_at = NULL,
+        updated_at = {SQL_NOW}
+    WHERE lower(email) = lower(?)
+"""
+
+MARK_REPLIED_BY_ID_SQL = f"""
+    UPDATE leads
+    SET replied = 1, status = 'replied', next_action = NULL, next_action_at = NULL,
+        updated_at = {SQL_NOW}
+    WHERE id = ? AND replied = 0
+"""
+
+# all post-send bookkeeping for one lead in a single statement
+UPDATE_AFTER_SEND_SQL = """
+    UPDATE leads
+    SET status = :status,
+        last_email_sent_at = :now,
+        updated_at = :now,
+        last_message_id = COALESCE(:message_id, last_message_id),
+        template_index = template_index + :bump_template,
+        followup_count = followup_count + :increment,
+        next_action = CASE
+            WHEN followup_count + :increment >= :max_followups THEN NULL
+            WHEN opened = 1 THEN 'followup'
+            ELSE 'resend'
+        END,
+        next_action_at = CASE
+            WHEN followup_count + :increment >= :max_followups THEN NULL
+            WHEN opened = 1 THEN :followup_at
+            ELSE :resend_at
+        END,
+        claimed_by = NULL,
+        lease_until = NULL,
+        sender_account = COALESCE(sender_account, :sender_account)
+    WHERE id = :id
+"""
+
+
+def get_leads_for_initial_send(limit, zones, chunk_size=None):
+    # zones: timezones whose send window is open. Yields InitialLead.
+    now_str = datetime.utcnow().isoformat()
+    return iter_records(INITIAL_SEND_SQL, {"now": now_str, "limit": limit, "zones": json.dumps(zones)},
+                        InitialLead, chunk_size)
+
+
+def get_leads_for_followup(limit, zones, chunk_size=None):
+    # every lead yielded is due: next_action_at has already passed.
+    # Yields FollowupLead.
+    now_str = datetime.utcnow().isoformat()
+    return iter_records(FOLLOWUP_SQL, {"now": now_str, "limit": limit, "zones": json.dumps(zones)},
+                        FollowupLead, chunk_size)
+
+
+# Distinct zones of leads that still have something to be sent, as a
+# skip-scan: each step is one seek for the next zone in the partial
+# timezone indexes, so the cost grows with the number of zones, not leads.
+PENDING_TIMEZONES_SQL = """
+    WITH RECURSIVE
+    new_zones(tz) AS (
+        SELECT MIN(timezone) FROM leads WHERE status = 'new'
+        UNION ALL
+        SELECT (SELECT MIN(timezone) FROM leads WHERE status = 'new' AND timezone > tz)
+        FROM new_zones WHERE tz IS NOT NULL
+    ),
+    followup_zones(tz) AS (
+        SELECT MIN(timezone) FROM leads WHERE next_action_at IS NOT NULL
+        UNION ALL
+        SELECT (SELECT MIN(timezone) FROM leads WHERE next_action_at IS NOT NULL AND timezone > tz)
+        FROM followup_zones WHERE tz IS NOT NULL
+    )
+    SELECT tz FROM new_zones WHERE tz IS NOT NULL
+    UNION
+    SELECT tz FROM followup_zones WHERE tz IS NOT NULL
+"""
+
+
+def get_pending_timezones():
+    return [row[0] for row in fetch_all(PENDING_TIMEZONES_SQL)]
+
+
+def get_next_action_at():
+    # earliest scheduled follow-up (partial index on next_action_at), or None
+    return fetch_all("SELECT MIN(next_action_at) FROM leads WHERE next_action_at IS NOT NULL")[0][0]
+
+
+def data_version():
+    # changes whenever another connection commits (an import, another worker)
+    return fetch_all("PRAGMA data_version")[0][0]
+
+
+def _after_send_params(lead_id, new_status, followup_increment, bump_template, message_id,
+                       sender_account=None):
+    now = datetime.utcnow()
+    return {
+        "id": lead_id,
+        "status": new_status,
+        "now": now.isoformat(),
+        "hour": now.strftime("%Y-%m-%dT%H"),
+        "sender_account": sender_account,
+        "message_id": message_id,
+        "bump_template": 1 if bump_template else 0,
+        "increment": 1 if followup_increment else 0,
+        "max_followups": MAX_FOLLOWUPS,
+        "followup_at": (now + timedelta(days=FOLLOWUP_AFTER_DAYS)).isoformat(),
+        "resend_at": (now + timedelta(days=RESEND_MAIN_AFTER_DAYS)).isoformat(),
+    }
+
+
+# =========================
+# Outbox
+# =========================
+#
+# Every planned message gets an outbox row keyed by a deterministic
+# idempotency key (lead, kind, sequence), so planning the same lead twice is
+# a no-op. Rows move queued -> sending -> sent | failed. A worker claims one
+# row right before handing it to SMTP, under a lease; the row only becomes
+# 'sent' in the same transaction as the lead's post-send update. A row still
+# 'sending' after its lease expired was interrupted mid-send and may or may
+# not have been delivered, so it is failed rather than retried unless
+# OUTBOX_RETRY_INTERRUPTED is set.
+
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", 300))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 3))
+OUTBOX_RETRY_INTERRUPTED = os.getenv("OUTBOX_RETRY_INTERRUPTED", "0") == "1"
+
+MARK_OUTBOX_SENT_SQL = """
+    UPDATE outbox
+    SET state = 'sent', sent_at = :now, lease_owner = NULL, lease_until = NULL
+    WHERE id = :outbox_id
+"""
+
+OUTBOX_COLUMNS = ("id, lead_id, kind, sequence, to_email, subject, body_html, message_id, attempts, "
+                  "sender_account")
+
+
+def outbox_key(lead_id, kind, sequence):
+    return f"lead:{lead_id}:{kind}:{sequence}"
+
+
+def queue_outbox(messages):
+    # messages: dicts with lead_id, kind, sequence, to_email, subject,
+    # body_html, message_id and sender_account. Returns how many were new.
+    if not messages:
+        return 0
+    now_str = datetime.utcnow().isoformat()
+    rows = [(outbox_key(m["lead_id"], m["kind"], m["sequence"]), m["lead_id"], m["kind"],
+             m["sequence"], m["to_email"], m["subject"], m["body_html"], m["message_id"],
+             m.get("sender_account"), now_str)
+            for m in messages]
+    with transaction() as conn:
+        before = conn.total_changes
+        conn.executemany("""
+            INSERT OR IGNORE INTO outbox
+                (idempotency_key, lead_id, kind, sequence, to_email, subject, body_html, message_id,
+                 sender_account, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        return conn.total_changes - before
+
+
+def recover_interrupted_outbox():
+    now_str = datetime.utcnow().isoformat()
+    if OUTBOX_RETRY_INTERRUPTED:
+        cur = execute("""
+            UPDATE outbox
+            SET state = 'queued', lease_owner = NULL, lease_until = NULL,
+                last_error = 'interrupted during send; requeued'
+            WHERE state = 'sending' AND lease_until < ?
+        """, (now_str,))
+    else:
+        cur = execute("""
+            UPDATE outbox
+            SET state = 'failed', lease_owner = NULL, lease_until = NULL,
+                last_error = 'interrupted during send; delivery unknown'
+            WHERE state = 'sending' AND lease_until < ?
+        """, (now_str,))
+    return cur.rowcount
+
+
+def get_queued_outbox(kinds, limit, lead_ids=None):
+    # lead_ids limits the rows to leads this worker has claimed
+    placeholders = ", ".join("?" for _ in kinds)
+    if lead_ids is None:
+        return fetch_all(f"""
+            SELECT {OUTBOX_COLUMNS}
+            FROM outbox
+            WHERE state = 'queued' AND kind IN ({placeholders})
+            ORDER BY id
+            LIMIT ?
+        """, (*kinds, limit))
+    rows = []
+    lead_ids = list(lead_ids)
+    for start in range(0, len(lead_ids), 500):
+        chunk = lead_ids[start:start + 500]
+        rows.extend(fetch_all(f"""
+            SELECT {OUTBOX_COLUMNS}
+            FROM outbox
+            WHERE state = 'queued' AND kind IN ({placeholders})
+              AND lead_id IN ({", ".join("?" for _ in chunk)})
+        """, (*kinds, *chunk)))
+    rows.sort()
+    return rows[:limit]
+
+
+def claim_outbox(outbox_id, owner):
+    # True if this worker now owns the row; False if someone else got it first
+    # or it is no longer queued.
+    lease_until = (datetime.utcnow() + timedelta(seconds=OUTBOX_LEASE_SECONDS)).isoformat()
+    cur = execute("""
+        UPDATE outbox
+        SET state = 'sending', attempts = attempts + 1, lease_owner = ?, lease_until = ?
+        WHERE id = ? AND state = 'queued'
+    """, (owner, lease_until, outbox_id))
+    return cur.rowcount == 1
+
+
+def release_outbox(outbox_id, error, retry):
+    # Send failed: requeue transient errors until attempts run out.
+    execute("""
+        UPDATE outbox
+        SET state = CASE WHEN ? AND attempts < ? THEN 'queued' ELSE 'failed' END,
+            last_error = ?, lease_owner = NULL, lease_until = NULL
+        WHERE id = ? AND state = 'sending'
+    """, (1 if retry else 0, OUTBOX_MAX_ATTEMPTS, str(error)[:500], outbox_id))
+
+
+def cancel_outbox(outbox_id, reason):
+    # Drop a queued row without sending it (e.g. the recipient got suppressed).
+    execute("""
+        UPDATE outbox SET state = 'failed', last_error = ?
+        WHERE id = ? AND state = 'queued'
+    """, (reason, outbox_id))
+
+
+def get_outbox_counts():
+    return dict(fetch_all("SELECT state, COUNT(*) FROM outbox GROUP BY state"))
+
+
+def get_message_open_stats():
+    # (kind, sequence, sent, opened) for every message sent from the outbox
+    return fetch_all("""
+        SELECT kind, sequence, COUNT(*), SUM(open_count > 0)
+        FROM outbox
+        WHERE state = 'sent'
+        GROUP BY kind, sequence
+        ORDER BY sequence, kind
+    """)
+
+
+# =========================
+# Sender accounts
+# =========================
+
+COUNT_SENDER_SEND_SQL = """
+    INSERT INTO sender_sends (account, hour, sent) VALUES (:sender_account, :hour, 1)
+    ON CONFLICT(account, hour) DO UPDATE SET sent = sent + 1
+"""
+
+
+def get_sender_usage(since_hour):
+    # (account, hour, sent) for hours >= since_hour ("YYYY-MM-DDTHH")
+    return fetch_all("SELECT account, hour, sent FROM sender_sends WHERE hour >= ?", (since_hour,))
+
+
+def get_lead_senders(lead_ids):
+    # {lead_id: sender_account} for leads that already have one
+    found = {}
+    lead_ids = list(lead_ids)
+    for start in range(0, len(lead_ids), 500):
+        chunk = lead_ids[start:start + 500]
+        found.update(fetch_all(f"""
+            SELECT id, sender_account FROM leads
+            WHERE id IN ({", ".join("?" for _ in chunk)}) AND sender_account IS NOT NULL
+        """, chunk))
+    return found
+
+
+# =========================
+# Lead leases
+# =========================
+#
+# A worker claims a batch of due leads under a lease (claimed_by,
+# lease_until), renews it from a background thread while it sends, and
+# releases it when the batch is done. A lease left behind by a crashed
+# worker simply expires and the leads become claimable again.
+
+LEAD_LEASE_SECONDS = int(os.getenv("LEAD_LEASE_SECONDS", 300))
+
+
+class LeadLease:
+    def __init__(self, owner, lease_seconds=LEAD_LEASE_SECONDS):
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _params(self, limit, zones):
+        now = datetime.utcnow()
+        return {
+            "owner": self.owner,
+            "now": now.isoformat(),
+            "lease_until": (now + timedelta(seconds=self.lease_seconds)).isoformat(),
+            "limit": limit,
+            "zones": json.dumps(zones),
+        }
+
+    def _claim(self, sql, limit, zones, record):
+        # RETURNING rows must be read before the claim commits; a batch is
+        # at most `limit` records
+        with transaction() as conn:
+            cur = conn.cursor()
+            cur.row_factory = record.row_factory
+            return cur.execute(sql, self._params(limit, zones)).fetchall()
+
+    def claim_initial(self, limit, zones):
+        return self._claim(CLAIM_INITIAL_SQL, limit, zones, InitialLead)
+
+    def claim_followups(self, limit, zones):
+        return self._claim(CLAIM_FOLLOWUP_SQL, limit, zones, FollowupLead)
+
+    def renew(self):
+        until = (datetime.utcnow() + timedelta(seconds=self.lease_seconds)).isoformat()
+        return execute("UPDATE leads SET lease_until = ? WHERE claimed_by = ?",
+                       (until, self.owner)).rowcount
+
+    def release(self):
+        return execute("UPDATE leads SET claimed_by = NULL, lease_until = NULL WHERE claimed_by = ?",
+                       (self.owner,)).rowcount
+
+    def _renew_loop(self):
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                self.renew()
+            except Exception as e:
+                print(f"\nError renewing lead lease for {self.owner}: {e}")
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._renew_loop, name="lead-lease", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.release()
+
+
+REPORT_COLUMNS = ["email", "domain_name", "vertical", "opened", "replied",
+                  "followup_count", "last_email_sent_at", "status"]
+
+REPORT_SUMMARY_SQL = """
+    SELECT COUNT(*),
+           COUNT(*) FILTER (WHERE opened = 1),
+           COUNT(*) FILTER (WHERE replied = 1),
+           COALESCE(SUM(followup_count), 0)
+    FROM leads
+"""
+
+REPORT_WATERMARK = "report_watermark"
+
+
+def get_report_summary():
+    # (total, opened, replied, total_followups), aggregated inside SQLite
+    return fetch_all(REPORT_SUMMARY_SQL)[0]
+
+
+def iter_report_rows(since=None, chunk_size=1000):
+    # Streams report rows from a dedicated cursor; with `since`, only leads
+    # whose updated_at is at or after that watermark.
+    sql = f"SELECT {', '.join(REPORT_COLUMNS)} FROM leads"
+    params = ()
+    if since:
+        sql += " WHERE updated_at >= ? ORDER BY updated_at"
+        params = (since,)
+    with _lock:
+        cur = get_connection().cursor()
+        cur.execute(sql, params)
+    while True:
+        with _lock:
+            rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def get_meta(key):
+    row = fetch_all("SELECT value FROM meta WHERE key = ?", (key,))
+    return row[0][0] if row else None
+
+
+def set_meta(key, value):
+    execute("""
+        INSERT INTO meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """, (key, value))
+
+
+def sql_now():
+    return fetch_all(f"SELECT {SQL_NOW}")[0][0]
+
+
+class PostSendBuffer:
+    # Group commit for post-send updates: statements are buffered and written
+    # in one transaction every `max_batch` sends or `max_delay_ms`, whichever
+    # comes first. A background thread handles the time-based flush.
+
+    def __init__(self, max_batch=50, max_delay_ms=500):
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay_ms / 1000
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, lead_id, new_status, followup_increment=False, bump_template=False,
+               message_id=None, outbox_id=None, sender_account=None):
+        params = _after_send_params(lead_id, new_status, followup_increment, bump_template,
+                                    message_id, sender_account)
+        params["outbox_id"] = outbox_id
+        with self._lock:
+            self._pending.append(params)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._pending) >= self.max_batch
+            self._ensure_thread()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._oldest = None
+        if not batch:
+            return 0
+        sent = [params for params in batch if params["outbox_id"] is not None]
+        counted = [params for params in batch if params["sender_account"] is not None]
+        try:
+            # the lead update, its outbox row flipping to 'sent' and the
+            # sender's quota count commit together
+            with transaction() as conn:
+                conn.executemany(UPDATE_AFTER_SEND_SQL, batch)
+                conn.executemany(MARK_OUTBOX_SENT_SQL, sent)
+                conn.executemany(COUNT_SENDER_SEND_SQL, counted)
+        except Exception as e:
+            print(f"\nError writing {len(batch)} post-send updates: {e}")
+            # fall back to one lead at a time so a bad row can't sink the rest
+            for params in batch:
+                try:
+                    with transaction() as conn:
+                        conn.execute(UPDATE_AFTER_SEND_SQL, params)
+                        if params["outbox_id"] is not None:
+                            conn.execute(MARK_OUTBOX_SENT_SQL, params)
+                        if params["sender_account"] is not None:
+                            conn.execute(COUNT_SENDER_SEND_SQL, params)
+                except Exception as e:
+                    print(f"Error updating lead {params['id']}: {e}")
+        return len(batch)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="post-send-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.max_delay / 2)
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay
+            if due:
+                self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+# =========================
+# Open events
+# =========================
+#
+# Every open is appended to open_events; the opened flag and counters on
+# leads are derived from the log incrementally, past a watermark kept in
+# meta. Replaying a log after a tracker outage is therefore just an insert.
+
+OPEN_EVENTS_WATERMARK = "open_events_applied_id"
+
+# Pixel URLs carry signed tokens (tracking_tokens.py). The key comes from
+# TRACKING_SECRET, or is generated once and kept in meta so the sender and a
+# tracker on the same database agree. Hits with a pre-token tracking_id are
+# still counted while TRACKING_ACCEPT_LEGACY_TIDS is on; switch it off once
+# mail sent before the upgrade has gone quiet. New leads never get such an
+# id, so the set is fixed and is loaded once, letting unknown ids be refused
+# without a lookup.
+TRACKING_SECRET = os.getenv("TRACKING_SECRET", "")
+TRACKING_ACCEPT_LEGACY_TIDS = os.getenv("TRACKING_ACCEPT_LEGACY_TIDS", "1") != "0"
+TRACKING_SECRET_KEY = "tracking_secret"
+
+_signer = None
+_legacy_tids = None
+
+
+def tracking_signer():
+    global _signer
+    if _signer is None:
+        secret = TRACKING_SECRET
+        if not secret:
+            with transaction() as conn:
+                conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                             (TRACKING_SECRET_KEY, secrets.token_hex(32)))
+                secret = conn.execute("SELECT value FROM meta WHERE key = ?",
+                                      (TRACKING_SECRET_KEY,)).fetchone()[0]
+        _signer = TokenSigner(secret)
+    return _signer
+
+
+def legacy_tids():
+    # {tracking_id: lead_id} for leads whose tracking_id predates signed
+    # tokens (those embed the recipient address)
+    global _legacy_tids
+    if _legacy_tids is None:
+        _legacy_tids = {} if not TRACKING_ACCEPT_LEGACY_TIDS else dict(fetch_all(
+            "SELECT tracking_id, id FROM leads WHERE tracking_id LIKE '%@%'"))
+    return _legacy_tids
+
+
+def parse_tid(tid):
+    # (lead_id, kind, sequence) for a valid token, (lead_id, None, None) for
+    # a known legacy tracking_id, None for anything else. No I/O once the
+    # signer and the legacy ids are loaded.
+    decoded = tracking_signer().verify(tid)
+    if decoded:
+        return decoded
+    lead_id = legacy_tids().get(tid)
+    if lead_id is not None:
+        return lead_id, None, None
+    return None
+
+
+def _apply_open_events(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (OPEN_EVENTS_WATERMARK,)).fetchone()
+    low = int(row[0]) if row else 0
+    high = conn.execute("SELECT MAX(id) FROM open_events").fetchone()[0] or 0
+    if high <= low:
+        return 0
+    before = conn.total_changes
+    conn.execute(APPLY_OPEN_EVENTS_SQL, {"low": low, "high": high})
+    updated = conn.total_changes - before
+    conn.execute(APPLY_MESSAGE_OPENS_SQL, {"low": low, "high": high})
+    conn.execute("""
+        INSERT INTO meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """, (OPEN_EVENTS_WATERMARK, str(high)))
+    return updated
+
+
+def parse_open_timestamp(value):
+    # ISO 8601 string or epoch seconds/milliseconds -> naive UTC isoformat,
+    # or None when the value is not a timestamp
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Vercel and most log exports use epoch milliseconds
+        seconds = value / 1000 if value > 1e11 else value
+        try:
+            return datetime.utcfromtimestamp(seconds).isoformat()
+        except (OverflowError, OSError, ValueError):
+            return None
+    if isinstance(value, str) and value:
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt.isoformat()
+    return None
+
+
+def record_opens(events, source="pixel"):
+    # events: iterable of (tid, opened_at) where opened_at may be None for
+    # "now" and tid is a signed token or a legacy tracking_id; anything else
+    # is dropped. The same tid at the same instant is only stored once, so
+    # replaying a log twice is harmless. Returns the number of leads updated.
+    now_str = datetime.utcnow().isoformat()
+    rows = []
+    for tid, opened_at in events:
+        parsed = parse_tid(tid)
+        if parsed is not None:
+            rows.append((tid, opened_at or now_str, source, *parsed))
+    if not rows:
+        return 0
+    try:
+        with transaction() as conn:
+            conn.executemany("""
+                INSERT OR IGNORE INTO open_events (tracking_id, opened_at, source, lead_id, kind, sequence)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            return _apply_open_events(conn)
+    except Exception as e:
+        print(f"Error recording {len(rows)} open events: {e}")
+        return 0
+
+
+def find_leads_by_message_ids(message_ids):
+    # Returns {message_id: lead_id} for the ids we sent. Older sends only
+    # left their id in leads.last_message_id, newer ones are in the outbox.
+    found = {}
+    message_ids = list(message_ids)
+    for start in range(0, len(message_ids), 500):
+        chunk = message_ids[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        found.update(fetch_all(f"""
+            SELECT message_id, lead_id FROM outbox WHERE message_id IN ({placeholders})
+            UNION ALL
+            SELECT last_message_id, id FROM leads WHERE last_message_id IN ({placeholders})
+        """, (*chunk, *chunk)))
+    return found
+
+
+def record_replies(lead_ids, emails, watermarks=()):
+    # Marks the matched leads (by id, or by sender address when no Message-ID
+    # matched) and stores the per-folder sync watermarks in one transaction.
+    # Returns the number of leads newly marked as replied.
+    with transaction() as conn:
+        before = conn.total_changes
+        conn.executemany(MARK_REPLIED_BY_ID_SQL, [(lead_id,) for lead_id in lead_ids])
+        conn.executemany(MARK_REPLIED_SQL + " AND replied = 0", [(email,) for email in emails])
+        marked = conn.total_changes - before
+        conn.executemany("""
+            INSERT INTO meta (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        """, list(watermarks))
+    return marked
+
+
+# =========================
+# Suppression
+# =========================
+#
+# Addresses (or whole domains) that hard-bounced or were refused outright.
+# Adding one also takes the matching leads out of the send queues.
+
+SUPPRESS_LEADS_SQL = {
+    "address": f"""
+        UPDATE leads
+        SET status = 'bounced', next_action = NULL, next_action_at = NULL, updated_at = {SQL_NOW}
+        WHERE lower(email) = lower(?) AND status NOT IN ('bounced', 'replied')
+    """,
+    "domain": f"""
+        UPDATE leads
+        SET status = 'bounced', next_action = NULL, next_action_at = NULL, updated_at = {SQL_NOW}
+        WHERE email LIKE '%@' || ? AND status NOT IN ('bounced', 'replied')
+    """,
+}
+
+
+def add_suppressions(entries, watermarks=(), source="bounce"):
+    # entries: (value, kind, reason) with kind 'address' or 'domain'. Stores
+    # any sync watermarks in the same transaction. Returns how many values
+    # were new.
+    entries = [(value.strip().lower(), kind, reason) for value, kind, reason in entries if value]
+    now_str = datetime.utcnow().isoformat()
+    with transaction() as conn:
+        before = conn.total_changes
+        conn.executemany("""
+            INSERT OR IGNORE INTO suppression (value, kind, reason, source, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(value, kind, reason, source, now_str) for value, kind, reason in entries])
+        added = conn.total_changes - before
+        for kind, sql in SUPPRESS_LEADS_SQL.items():
+            conn.executemany(sql, [(value,) for value, k, _ in entries if k == kind])
+        conn.executemany("""
+            INSERT INTO meta (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        """, list(watermarks))
+    return added
+
+
+def get_suppressions():
+    return fetch_all("SELECT value, kind FROM suppression")
+
+
+# =========================
+# Query-plan check
+# =========================
+#
+# Guards against a schema or query edit silently turning a hot lookup back
+# into a full table scan.
+
+HOT_QUERIES = [
+    ("initial send selection", INITIAL_SEND_SQL, {"now": "", "limit": 1, "zones": "[]"},
+     "idx_leads_new_timezone"),
+    ("followup selection", FOLLOWUP_SQL, {"now": "", "limit": 1, "zones": "[]"},
+     "idx_leads_timezone_next_action"),
+    ("initial claim", CLAIM_INITIAL_SQL,
+     {"owner": "", "lease_until": "", "now": "", "limit": 1, "zones": "[]"}, "idx_leads_new_timezone"),
+    ("followup claim", CLAIM_FOLLOWUP_SQL,
+     {"owner": "", "lease_until": "", "now": "", "limit": 1, "zones": "[]"},
+     "idx_leads_timezone_next_action"),
+    ("pending timezones", PENDING_TIMEZONES_SQL, (), "idx_leads_new_timezone"),
+    ("open event apply", APPLY_OPEN_EVENTS_SQL, {"low": 0, "high": 0}, "idx_leads_tracking_id"),
+    ("message open apply", APPLY_MESSAGE_OPENS_SQL, {"low": 0, "high": 0}, "sqlite_autoindex_outbox_1"),
+    ("mark_replied", MARK_REPLIED_SQL, ("a@b.c",), "idx_leads_email_lower"),
+    ("reply message-id lookup", "SELECT lead_id FROM outbox WHERE message_id IN (?)",
+     ("<a@b.c>",), "idx_outbox_message_id"),
+]
+
+
+def check_query_plans():
+    results = []
+    for name, sql, params, index in HOT_QUERIES:
+        plan = [row[3] for row in fetch_all("EXPLAIN QUERY PLAN " + sql, params)]
+        uses_index = any(index in detail for detail in plan)
+        results.append((name, index, uses_index, plan))
+    return results
@@ -1,15 +1,18 @@
 import os
 import sys
 import csv
-import sqlite3
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv # type: ignore
-import time
 import traceback
-import random
+import secrets
+import socket
+import re
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote
 
 # =========================
 # Config and setup
@@ -17,6 +20,32 @@ import random
 
 load_dotenv()
 
+# local modules read their own settings from the environment, so they are
+# imported once .env has been loaded
+from db import (
+    init_db, insert_lead, insert_leads, PostSendBuffer,
+    check_query_plans, record_opens, get_report_summary, iter_report_rows,
+    get_meta, set_meta, sql_now, REPORT_COLUMNS, REPORT_WATERMARK,
+    queue_outbox, recover_interrupted_outbox, get_queued_outbox, claim_outbox, release_outbox,
+    get_outbox_counts, find_leads_by_message_ids, record_replies, cancel_outbox,
+    add_suppressions, get_suppressions, LeadLease, get_sender_usage, get_lead_senders,
+    get_leads_for_initial_send, get_leads_for_followup,
+    get_next_action_at, data_version, close_connection, get_pending_timezones,
+    tracking_signer, get_message_open_stats, parse_open_timestamp,
+)
+from send_scheduler import SendScheduler
+from smtp_pool import is_permanent_failure
+from sender_pool import SenderPool, SenderAccount, hour_key
+from template_registry import TemplateRegistry
+from vertical_classifier import VerticalClassifier
+from reply_sync import ImapReplySync
+from bounces import ImapBounceSync, parse_bounce, iter_bounce_files
+from suppression import SuppressionList
+from metrics import metrics
+from message_export import open_export
+from daemon import Daemon
+from send_windows import SendWindow, WindowScheduler, infer_timezone, valid_timezone
+
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_EMAIL = os.getenv("SMTP_EMAIL")
@@ -24,23 +53,77 @@ SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 FROM_NAME = os.getenv("FROM_NAME", "Shoeb")
 MAX_EMAILS_PER_RUN = int(os.getenv("MAX_EMAILS_PER_RUN", 30))
 
+# SMTP session pool configs
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", os.getenv("SEND_WORKERS", 4)))
+SMTP_MAX_MESSAGES_PER_CONN = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONN", 50))
+SMTP_NOOP_AFTER_SECONDS = int(os.getenv("SMTP_NOOP_AFTER_SECONDS", 30))
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "1") != "0"
+
+# sender accounts; without a senders.json the SMTP_* settings above are the
+# one account. Quotas of 0 mean unlimited.
+SENDERS_CONFIG = os.getenv("SENDERS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "senders.json"))
+SMTP_DAILY_QUOTA = int(os.getenv("SMTP_DAILY_QUOTA", 0))
+SMTP_HOURLY_QUOTA = int(os.getenv("SMTP_HOURLY_QUOTA", 0))
+
 # tracking + random delay configs
 VERCEL_PIXEL_BASE = os.getenv("VERCEL_PIXEL_BASE", "https://your-vercel-app.vercel.app/api/pixel")
+# jittered gap between two sends to the same recipient provider
 DELAY_MIN_SECONDS = int(os.getenv("DELAY_MIN_SECONDS", 7))
 DELAY_MAX_SECONDS = int(os.getenv("DELAY_MAX_SECONDS", 22))
 
-DB_PATH = "emails.db"
+# recipient-local send window (hours in the lead's own timezone; equal start
+# and end hours switch windows off). SEND_TIMEZONE applies to leads whose
+# timezone is unknown; left empty, they can be sent to at any hour.
+SEND_WINDOW_START_HOUR = int(os.getenv("SEND_WINDOW_START_HOUR", 9))
+SEND_WINDOW_END_HOUR = int(os.getenv("SEND_WINDOW_END_HOUR", 17))
+SEND_WINDOW_WEEKDAYS_ONLY = os.getenv("SEND_WINDOW_WEEKDAYS_ONLY", "1") != "0"
+SEND_TIMEZONE = os.getenv("SEND_TIMEZONE", "")
+
+# concurrent send scheduler configs
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", 4))
+GLOBAL_SENDS_PER_MINUTE = int(os.getenv("GLOBAL_SENDS_PER_MINUTE", 20))
+
+TEMPLATES_DIR = os.getenv("TEMPLATES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+DEFAULT_VERTICAL = "local"
+VERTICALS_CONFIG = os.getenv("VERTICALS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "verticals.json"))
+
+# post-send bookkeeping is committed every N sends or T milliseconds
+POST_SEND_BATCH_SIZE = int(os.getenv("POST_SEND_BATCH_SIZE", 50))
+POST_SEND_FLUSH_MS = int(os.getenv("POST_SEND_FLUSH_MS", 500))
 
-RESEND_MAIN_AFTER_DAYS = 2
-FOLLOWUP_AFTER_DAYS = 4
-MAX_FOLLOWUPS = 4  # you can adjust this
+# leads claimed per batch by `worker`
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", 100))
+
+# daemon mode; intervals in seconds, a sync interval of 0 disables that task
+DAEMON_POLL_SECONDS = float(os.getenv("DAEMON_POLL_SECONDS", 5))
+DAEMON_SEND_INTERVAL = int(os.getenv("DAEMON_SEND_INTERVAL", 60))
+DAEMON_REPLY_SYNC_INTERVAL = int(os.getenv("DAEMON_REPLY_SYNC_INTERVAL", 300))
+DAEMON_BOUNCE_SYNC_INTERVAL = int(os.getenv("DAEMON_BOUNCE_SYNC_INTERVAL", 900))
+
+# rows validated and inserted per transaction by import_csv
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))
+
+# reply sync configs; the mailbox defaults to the sending account
+IMAP_HOST = os.getenv("IMAP_HOST", "imap.gmail.com")
+IMAP_PORT = int(os.getenv("IMAP_PORT", 993))
+IMAP_USER = os.getenv("IMAP_USER", SMTP_EMAIL)
+IMAP_PASSWORD = os.getenv("IMAP_PASSWORD", SMTP_PASSWORD)
+IMAP_FOLDERS = [f.strip() for f in os.getenv("IMAP_FOLDERS", "INBOX").split(",") if f.strip()]
+IMAP_USE_SSL = os.getenv("IMAP_USE_SSL", "1") != "0"
+
+# where send runs leave their metrics (either may be empty to skip it); a
+# node_exporter textfile directory works for the Prometheus file
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE", "")
+METRICS_JSON_FILE = os.getenv("METRICS_JSON_FILE", "")
 
 
 # =========================
 # Simple progress bar
 # =========================
 
-def progress_bar(current, total, prefix=""):
+def progress_bar(current, total, prefix="", detail=None):
+    # detail replaces the "(current/total)" count, for progress measured in
+    # something other than the items being processed
     if total == 0:
         return
     bar_length = 40
@@ -48,221 +131,114 @@ def progress_bar(current, total, prefix=""):
     filled_length = int(bar_length * fraction)
     bar = "#" * filled_length + "-" * (bar_length - filled_length)
     percent = int(fraction * 100)
-    sys.stdout.write(f"\r{prefix} [{bar}] {percent}% ({current}/{total})")
+    sys.stdout.write(f"\r{prefix} [{bar}] {percent}% ({detail or f'{current}/{total}'})")
     sys.stdout.flush()
     if current == total:
         sys.stdout.write("\n")
 
 
 # =========================
-# Human-like delay
+# Sender accounts
 # =========================
 
-def human_delay():
-    delay = random.randint(DELAY_MIN_SECONDS, DELAY_MAX_SECONDS)
-    time.sleep(delay)
+def _load_sender_pool():
+    defaults = dict(
+        from_name=FROM_NAME,
+        use_tls=SMTP_USE_TLS,
+        pool_size=SMTP_POOL_SIZE,
+        max_messages_per_conn=SMTP_MAX_MESSAGES_PER_CONN,
+        noop_after_seconds=SMTP_NOOP_AFTER_SECONDS,
+    )
+    if os.path.exists(SENDERS_CONFIG):
+        return SenderPool.from_file(SENDERS_CONFIG, **defaults)
+    return SenderPool([SenderAccount(
+        "default", SMTP_HOST, SMTP_PORT, SMTP_EMAIL, SMTP_PASSWORD,
+        daily_quota=SMTP_DAILY_QUOTA, hourly_quota=SMTP_HOURLY_QUOTA, **defaults,
+    )])
 
 
-# =========================
-# Database helpers
-# =========================
+# Every account has its own SMTP session pool; connections are opened lazily
+# on first send and closed by the actions when they finish.
+sender_pool = _load_sender_pool()
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS leads (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT NOT NULL,
-            domain_name TEXT NOT NULL,
-            first_name TEXT,
-            vertical TEXT,
-            template_index INTEGER NOT NULL DEFAULT 0,
-            status TEXT NOT NULL DEFAULT 'new',
-            opened INTEGER NOT NULL DEFAULT 0,
-            replied INTEGER NOT NULL DEFAULT 0,
-            last_email_sent_at TEXT,
-            followup_count INTEGER NOT NULL DEFAULT 0,
-            tracking_id TEXT
-        );
-    """)
-    conn.commit()
-    conn.close()
-
-
-def add_lead(email, domain_name, first_name=None, vertical=None):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    tracking_id = f"{email}-{int(datetime.utcnow().timestamp())}"
-    if vertical is None or vertical.strip() == "":
-        vertical = detect_vertical(domain_name)
-    template_index = 0  # will rotate among 0,1,2
-    try:
-        c.execute("""
-            INSERT INTO leads (email, domain_name, first_name, vertical, template_index, tracking_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (email, domain_name, first_name, vertical, template_index, tracking_id))
-        conn.commit()
-    except Exception as e:
-        print(f"Error inserting lead {email}: {e}")
-    finally:
-        conn.close()
-
-
-def get_leads_for_initial_send(limit):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        SELECT id, email, domain_name, first_name, vertical, template_index, tracking_id
-        FROM leads
-        WHERE status = 'new'
-        LIMIT ?
-    """, (limit,))
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-
-def get_leads_for_followup(limit):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        SELECT id, email, domain_name, first_name, vertical, status, opened, replied,
-               last_email_sent_at, followup_count, tracking_id
-        FROM leads
-        WHERE replied = 0
-          AND status IN ('initial_sent', 'followup')
-          AND followup_count < ?
-        LIMIT ?
-    """, (MAX_FOLLOWUPS, limit))
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-
-def get_all_leads():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        SELECT email, domain_name, vertical, opened, replied, followup_count, last_email_sent_at, status
-        FROM leads
-    """)
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-
-def update_after_send(lead_id, new_status, followup_increment=False):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    now_str = datetime.utcnow().isoformat()
-    try:
-        if followup_increment:
-            c.execute("""
-                UPDATE leads
-                SET status = ?, last_email_sent_at = ?, followup_count = followup_count + 1
-                WHERE id = ?
-            """, (new_status, now_str, lead_id))
-        else:
-            c.execute("""
-                UPDATE leads
-                SET status = ?, last_email_sent_at = ?
-                WHERE id = ?
-            """, (new_status, now_str, lead_id))
-        conn.commit()
-    except Exception as e:
-        print(f"Error updating lead {lead_id}: {e}")
-    finally:
-        conn.close()
 
+def load_sender_usage():
+    # seed quota accounting with what was sent in the last 24 hours
+    since = hour_key(datetime.utcnow() - timedelta(hours=23))
+    sender_pool.load_usage(get_sender_usage(since))
 
-def bump_template_index(lead_id, current_index):
-    new_index = (current_index + 1) % 3
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute("""
-            UPDATE leads
-            SET template_index = ?
-            WHERE id = ?
-        """, (new_index, lead_id))
-        conn.commit()
-    except Exception as e:
-        print(f"Error updating template_index for {lead_id}: {e}")
-    finally:
-        conn.close()
 
+# =========================
+# Send scheduling
+# =========================
 
-def mark_opened(tracking_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute("""
-            UPDATE leads
-            SET opened = 1
-            WHERE tracking_id = ?
-        """, (tracking_id,))
-        conn.commit()
-    except Exception as e:
-        print(f"Error marking opened for tracking_id {tracking_id}: {e}")
-    finally:
-        conn.close()
+# Replaces the old per-process human_delay(): the jittered delay now applies
+# between sends to the same provider, with a global cap across all of them.
+# Workers and the global rate are per sender account, so capacity grows with
+# the number of accounts.
+send_scheduler = SendScheduler(
+    workers=SEND_WORKERS * len(sender_pool),
+    spacing_min=DELAY_MIN_SECONDS,
+    spacing_max=DELAY_MAX_SECONDS,
+    global_per_minute=GLOBAL_SENDS_PER_MINUTE * len(sender_pool),
+)
 
 
-def mark_replied(email):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute("""
-            UPDATE leads
-            SET replied = 1, status = 'replied'
-            WHERE email = ?
-        """, (email,))
-        conn.commit()
-    except Exception as e:
-        print(f"Error marking replied for {email}: {e}")
-    finally:
-        conn.close()
+# Which recipient timezones may be written to right now; see send_windows.py.
+send_windows = WindowScheduler(
+    SendWindow(SEND_WINDOW_START_HOUR, SEND_WINDOW_END_HOUR, SEND_WINDOW_WEEKDAYS_ONLY),
+    default_zone=valid_timezone(SEND_TIMEZONE),
+)
+
+
+def open_zones():
+    # picks up zones of newly imported leads, then the ones open now
+    send_windows.add_zones(get_pending_timezones())
+    return send_windows.open_zones()
 
 
 # =========================
-# Vertical detection
+# Database helpers
 # =========================
 
-def detect_vertical(domain_name):
-    dn = domain_name.lower()
-    if any(word in dn for word in ["bed", "sleep", "mattress", "pillow"]):
-        return "sleep"
-    if any(word in dn for word in ["ai", "tech", "cloud", "data", "bot"]):
-        return "ai"
-    return "local"  # default catch-all
+def new_tracking_id():
+    # Unique per lead and opaque: pixel URLs carry signed per-message tokens
+    # (see tracking_token), so this never needs to name the recipient.
+    return secrets.token_urlsafe(12)
+
+
+def add_lead(email, domain_name, first_name=None, vertical=None, timezone_name=None):
+    tracking_id = new_tracking_id()
+    if vertical is None or vertical.strip() == "":
+        vertical = detect_vertical(domain_name)
+    template_index = 0  # rotates through the vertical's template variants
+    timezone_name = valid_timezone(timezone_name) or infer_timezone(email)
+    insert_lead(email, domain_name, first_name, vertical, template_index, tracking_id, timezone_name)
 
 
 # =========================
-# Email signature with LinkedIn + X
+# Vertical detection
 # =========================
 
-def social_signature_html():
-    linkedin_url = os.getenv("LINKEDIN_URL", "https://www.linkedin.com/in/yourprofile")
-    x_url = os.getenv("X_URL", "https://x.com/yourhandle")
+# Keyword rules are data (verticals.json); see vertical_classifier.py.
+vertical_classifier = VerticalClassifier.from_file(VERTICALS_CONFIG)
 
-    # simple icon-like links (emoji placeholders)
-    return f"""
-    <p style="margin-top: 16px;">
-      Best regards,<br>
-      {FROM_NAME}<br>
-      <a href="{linkedin_url}" style="text-decoration:none; margin-right:8px;">🔗 LinkedIn</a>
-      <a href="{x_url}" style="text-decoration:none;">✖ X</a>
-    </p>
-    """
+
+def detect_vertical(domain_name):
+    return vertical_classifier.classify(domain_name)
 
 
 # =========================
 # Tracking pixel
 # =========================
 
-def build_tracking_pixel(tracking_id):
-    tracking_url = f"{VERCEL_PIXEL_BASE}?tid={tracking_id}"
+def tracking_token(lead_id, kind, sequence):
+    # short signed token naming the lead and the message (tracking_tokens.py)
+    return tracking_signer().sign(lead_id, kind, sequence)
+
+
+def build_tracking_pixel(tid):
+    tracking_url = f"{VERCEL_PIXEL_BASE}?tid={tid}"
     return f'<img src="{tracking_url}" width="1" height="1" style="display:none;" alt="" />'
 
 
@@ -270,263 +246,37 @@ def build_tracking_pixel(tracking_id):
 # Email templates
 # =========================
 
-# --- Sleep vertical templates ---
-
-def sleep_template_1(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        I wanted to share a domain that feels like a natural fit for a sleep or bedding brand:
-      </p>
-      <p style="font-size:18px; font-weight:bold; margin:16px 0;">
-        {domain_name}
-      </p>
-      <p>
-        It's memorable, easy to say, and clearly connected to beds and sleep products. Names like this
-        tend to convert better in ads and feel more trustworthy to customers.
-      </p>
-      <p>
-        I'm the current owner and considering selling it to a brand that can really use it.
-        Would you be open to seeing a simple price range for {domain_name}?
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-def sleep_template_2(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        Quick note: I own the domain <strong>{domain_name}</strong> and thought it could be interesting for
-        a brand in the sleep, bedding, or home comfort niche.
-      </p>
-      <p>
-        The name is clean, brandable, and intuitive — which helps with word-of-mouth, ads, and long-term branding.
-      </p>
-      <p>
-        If it's not relevant for you right now, no worries at all. If it might be, I can send over
-        a price range and we can see if it fits your plans.
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-def sleep_template_3(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        Reaching out because I own <strong>{domain_name}</strong>, which I see as a strong brand asset for anyone
-        in the bed or sleep space.
-      </p>
-      <p>
-        Short, relevant domains like this are getting harder to find, especially ones that directly match
-        the product category.
-      </p>
-      <p>
-        Are you open to a quick, no-pressure chat about this? I can share a realistic price range
-        and you can decide if it's worth considering.
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-# --- AI vertical templates ---
-
-def ai_template_1(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        I'm reaching out because I own the domain <strong>{domain_name}</strong>, which feels like a strong fit
-        for an AI, SaaS, or automation product.
-      </p>
-      <p>
-        It's short, brandable, and clearly positioned around technology — ideal for marketing, investor decks,
-        and long-term branding.
-      </p>
-      <p>
-        I'm open to selling it to the right team. Would you be interested in seeing a simple price range
-        for {domain_name}?
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-def ai_template_2(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        Quick message: I own <strong>{domain_name}</strong> and thought it could be a meaningful upgrade
-        or launch name for an AI/tech product.
-      </p>
-      <p>
-        A strong domain often makes a difference in perceived credibility, especially when you’re pitching
-        customers or partners.
-      </p>
-      <p>
-        If it's not a fit, no problem. If it is, I'm happy to share a price range and next steps.
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-def ai_template_3(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        I won't take much of your time — I own <strong>{domain_name}</strong>, a name that aligns well with
-        AI and modern software products.
-      </p>
-      <p>
-        Names like this can be hard to secure later, once a product has already grown.
-      </p>
-      <p>
-        Would you like me to send over a quick price range so you can see if it’s worth exploring?
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-# --- Local/service vertical templates ---
-
-def local_template_1(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        I came across your business and wanted to share a domain I own that could fit your market:
-      </p>
-      <p style="font-size:18px; font-weight:bold; margin:16px 0;">
-        {domain_name}
-      </p>
-      <p>
-        It's clear, easy to remember, and directly ties into your type of service — which helps with trust
-        and local search.
-      </p>
-      <p>
-        I'm considering selling it to a business that can put it to good use. Would you be open to seeing
-        a simple price range?
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-def local_template_2(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        Quick message about the domain <strong>{domain_name}</strong> that I own. It's a straightforward,
-        descriptive name that can help customers instantly understand what you offer.
-      </p>
-      <p>
-        Domains like this often perform better in ads and word-of-mouth, especially for local or service businesses.
-      </p>
-      <p>
-        If it's not on your roadmap, no worries. If you’re curious, I can send a price range and we can go from there.
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-def local_template_3(first_name, domain_name, pixel):
-    if not first_name:
-        first_name = "Hi"
-    sig = social_signature_html()
-    return f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        Reaching out regarding <strong>{domain_name}</strong>, a domain I own that I think could serve as a strong
-        brand or campaign name for your type of business.
-      </p>
-      <p>
-        It’s the kind of name that’s easy to recall and straightforward to promote.
-      </p>
-      <p>
-        Would you like me to share a quick price range so you can decide if it’s worth considering?
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-
-
-def get_initial_template_html(vertical, template_index, first_name, domain_name, tracking_id):
-    pixel = build_tracking_pixel(tracking_id)
+# Bodies are loaded from templates/ (see template_registry.py); the
+# signature and sender details are baked in once when a file is compiled.
+TEMPLATE_STATIC = {
+    "linkedin_url": os.getenv("LINKEDIN_URL", "https://www.linkedin.com/in/yourprofile"),
+    "x_url": os.getenv("X_URL", "https://x.com/yourhandle"),
+}
+email_templates = TemplateRegistry(TEMPLATES_DIR, static={"from_name": FROM_NAME, **TEMPLATE_STATIC})
 
-    if vertical == "sleep":
-        templates = [sleep_template_1, sleep_template_2, sleep_template_3]
-    elif vertical == "ai":
-        templates = [ai_template_1, ai_template_2, ai_template_3]
-    else:
-        templates = [local_template_1, local_template_2, local_template_3]
+# one compiled registry per sender name, so each account signs as itself
+_templates_by_sender = {FROM_NAME: email_templates}
+
+
+def templates_for(from_name):
+    registry = _templates_by_sender.get(from_name)
+    if registry is None:
+        registry = TemplateRegistry(TEMPLATES_DIR, static={"from_name": from_name, **TEMPLATE_STATIC})
+        _templates_by_sender[from_name] = registry
+    return registry
 
-    func = templates[template_index % 3]
-    return func(first_name, domain_name, pixel)
+
+@metrics.timed("render")
+def get_initial_template_html(vertical, template_index, first_name, domain_name, tid,
+                              from_name=FROM_NAME):
+    registry = templates_for(from_name)
+    templates = registry.variants(vertical) or registry.variants(DEFAULT_VERTICAL)
+    template = templates[template_index % len(templates)]
+    return template.render(
+        first_name=first_name or "Hi",
+        domain_name=domain_name,
+        pixel=build_tracking_pixel(tid),
+    )
 
 
 # =========================
@@ -550,186 +300,594 @@ def followup_subject(domain_name, follow_number):
         return f"{domain_name} — should I close this out?"
 
 
-def followup_email_html(first_name, domain_name, tracking_id, follow_number):
-    if not first_name:
-        first_name = "Hi"
-    pixel = build_tracking_pixel(tracking_id)
-    sig = social_signature_html()
-
-    html = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color:#222; line-height:1.6;">
-      <p>{first_name},</p>
-      <p>
-        Just a quick follow-up regarding the domain <strong>{domain_name}</strong> that I reached out about earlier.
-      </p>
-      <p>
-        If the timing or fit isn’t right, no problem at all — just let me know and I’ll close the loop on my side.
-        If it could be useful for your plans, I can share a simple price range and we can see if it makes sense.
-      </p>
-      <p>
-        Would you like me to send over the price range for <strong>{domain_name}</strong>?
-      </p>
-      {sig}
-      {pixel}
-    </body>
-    </html>
-    """
-    return html
+@metrics.timed("render")
+def followup_email_html(first_name, domain_name, tid, follow_number, from_name=FROM_NAME):
+    return templates_for(from_name).get("followup").render(
+        first_name=first_name or "Hi",
+        domain_name=domain_name,
+        pixel=build_tracking_pixel(tid),
+        follow_number=follow_number,
+    )
 
 
 # =========================
 # Email sending
 # =========================
 
-def send_email(to_email, subject, html_body):
-    msg = MIMEMultipart("alternative")
-    msg["From"] = f"{FROM_NAME} <{SMTP_EMAIL}>"
-    msg["To"] = to_email
-    msg["Subject"] = subject
+# Post-send status updates are group-committed; the actions flush on exit.
+post_send = PostSendBuffer(max_batch=POST_SEND_BATCH_SIZE, max_delay_ms=POST_SEND_FLUSH_MS)
+
 
-    mime_html = MIMEText(html_body, "html")
-    msg.attach(mime_html)
+@metrics.timed("send")
+def send_email(to_email, subject, html_body, message_id=None, account=None):
+    # each account's From, MIME-Version and boundary are encoded once per run
+    account = account or sender_pool.default
+    with metrics.timer("mime_build"):
+        message_id, msg_bytes = account.builder.build(to_email, subject, html_body, message_id)
 
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_EMAIL, SMTP_PASSWORD)
-            server.sendmail(SMTP_EMAIL, to_email, msg.as_string())
+        account.pool.sendmail(account.from_email, to_email, msg_bytes)
+        return message_id
     except smtplib.SMTPException as e:
-        print(f"\nSMTP error sending to {to_email}: {e}")
-        traceback.print_exc()
+        with send_scheduler.output_lock:
+            print(f"\nSMTP error sending to {to_email}: {e}")
+            traceback.print_exc()
         raise
     except Exception as e:
-        print(f"\nUnexpected error sending to {to_email}: {e}")
-        traceback.print_exc()
+        with send_scheduler.output_lock:
+            print(f"\nUnexpected error sending to {to_email}: {e}")
+            traceback.print_exc()
         raise
 
 
+# =========================
+# Suppression
+# =========================
+
+def load_suppressions():
+    # read once per run; every lookup after that is an in-memory set hit
+    return SuppressionList.from_rows(get_suppressions())
+
+
+def _suppression_entry(suppressions, email, reason):
+    # (value, kind, reason) for add_suppressions, or None if not suppressed
+    kind = suppressions.reason(email)
+    if kind is None:
+        return None
+    value = email if kind == "address" else email.rsplit("@", 1)[-1]
+    return value, kind, reason
+
+
 # =========================
 # CSV import
 # =========================
 
+def _read_csv_rows(csv_path, progress):
+    # Rows are produced lazily; bytes read are counted so progress can be
+    # shown without knowing the row count up front.
+    with open(csv_path, "rb") as f:
+        def lines():
+            encoding = "utf-8-sig"
+            for raw in f:
+                progress["bytes"] += len(raw)
+                yield raw.decode(encoding)
+                encoding = "utf-8"
+
+        yield from csv.DictReader(lines())
+
+
+def _prepare_lead_rows(chunk, suppressions):
+    rows = []
+    skipped = 0
+    suppressed = 0
+    for i, row in chunk:
+        email = (row.get("email") or "").strip()
+        domain_name = (row.get("domain_name") or "").strip()
+        first_name = (row.get("first_name") or "").strip() or None
+        vertical = (row.get("vertical") or "").strip().lower() or None
+        timezone_name = valid_timezone(row.get("timezone")) or infer_timezone(email)
+
+        if not email or not domain_name or "@" not in email:
+            print(f"\nSkipping row {i}: missing or invalid email or domain_name.")
+            skipped += 1
+            continue
+        if suppressions.is_suppressed(email):
+            suppressed += 1
+            continue
+
+        rows.append((email, domain_name, first_name, vertical, 0, new_tracking_id(),
+                     timezone_name))
+
+    # classify the whole chunk in one pass for rows without a CSV vertical
+    missing = [i for i, row in enumerate(rows) if row[3] is None]
+    for i, vertical in zip(missing, vertical_classifier.classify_many([rows[i][1] for i in missing])):
+        email, domain_name, first_name, _, template_index, tracking_id, timezone_name = rows[i]
+        rows[i] = (email, domain_name, first_name, vertical, template_index, tracking_id, timezone_name)
+    return rows, skipped, suppressed
+
+
 def import_from_csv(csv_path):
     if not os.path.exists(csv_path):
         print(f"CSV file not found: {csv_path}")
         return
 
-    with open(csv_path, newline="", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-        total = len(rows)
-
-        if total == 0:
-            print("CSV is empty or no rows found.")
-            return
-
-        print(f"Importing {total} leads from {csv_path}...")
-        for i, row in enumerate(rows, start=1):
-            email = row.get("email", "").strip()
-            domain_name = row.get("domain_name", "").strip()
-            first_name = row.get("first_name", "").strip() or None
-            vertical = row.get("vertical", "").strip() or None
-
-            if not email or not domain_name:
-                print(f"Skipping row {i}: missing email or domain_name.")
-            else:
-                add_lead(email, domain_name, first_name, vertical)
-
-            progress_bar(i, total, prefix="Import progress")
-        print("Import completed.")
+    total_bytes = os.path.getsize(csv_path)
+    progress = {"bytes": 0}
+    imported = 0
+    skipped = 0
+    suppressed = 0
+    chunk = []
+    suppressions = load_suppressions()
+
+    def flush():
+        nonlocal imported, skipped, suppressed
+        rows, bad, blocked = _prepare_lead_rows(chunk, suppressions)
+        inserted = insert_leads(rows)
+        imported += inserted
+        skipped += bad + len(rows) - inserted
+        suppressed += blocked
+        chunk.clear()
+        # the percentage is by bytes read; the count is rows
+        progress_bar(progress["bytes"], total_bytes, prefix="Import progress",
+                     detail=f"{imported + skipped + suppressed} rows")
+
+    print(f"Importing leads from {csv_path}...")
+    for i, row in enumerate(_read_csv_rows(csv_path, progress), start=1):
+        chunk.append((i, row))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush()
+    if chunk:
+        flush()
+
+    if imported == 0 and skipped == 0 and suppressed == 0:
+        print("CSV is empty or no rows found.")
+        return
+    print(f"Import completed: {imported} leads imported, {skipped} rows skipped, "
+          f"{suppressed} suppressed.")
 
 
 # =========================
 # Core actions
 # =========================
+#
+# Both actions first render what is due into the outbox (db.queue_outbox),
+# then send whatever is queued. A lead is only ever queued once per
+# (kind, sequence), and each outbox row is claimed right before it goes to
+# SMTP, so re-running an action after a crash resumes instead of re-sending.
+
+# identifies this process in outbox and lead leases
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# outbox kind -> (lead status, followup_increment, bump_template)
+OUTBOX_KIND_UPDATES = {
+    "initial": ("initial_sent", False, True),
+    "resend": ("initial_sent", True, False),
+    "followup": ("followup", True, False),
+}
+
+
+def _outbox_message(lead_id, kind, sequence, email, subject, html, account):
+    return {
+        "lead_id": lead_id,
+        "kind": kind,
+        "sequence": sequence,
+        "to_email": email,
+        "subject": subject,
+        "body_html": html,
+        "message_id": account.builder.new_message_id(),
+        "sender_account": account.name,
+    }
+
 
 def action_send_initial():
-    leads = get_leads_for_initial_send(MAX_EMAILS_PER_RUN)
-    total = len(leads)
-    print(f"Found {total} leads for initial send.")
-
-    for idx, lead in enumerate(leads, start=1):
-        (lead_id, email, domain_name, first_name,
-         vertical, template_index, tracking_id) = lead
-        try:
-            subject = initial_subject(domain_name, vertical)
-            html = get_initial_template_html(vertical, template_index, first_name, domain_name, tracking_id)
-            send_email(email, subject, html)
-            update_after_send(lead_id, "initial_sent")
-            bump_template_index(lead_id, template_index)
-            progress_bar(idx, total, prefix="Sending initial emails")
-            print(f"\nSent initial email to {email} ({vertical}, template {template_index + 1})")
-            human_delay()
-        except Exception:
-            print(f"Failed to send initial email to {email}. Continuing with next.")
+    metrics.reset()
+    _recover_outbox()
+    suppressions = load_suppressions()
+    load_sender_usage()
+    with LeadLease(WORKER_ID) as lease:
+        with sender_pool, post_send:
+            _initial_pass(lease, MAX_EMAILS_PER_RUN, suppressions)
+    export_metrics()
 
 
 def action_run_followups():
-    leads = get_leads_for_followup(MAX_EMAILS_PER_RUN)
-    total = len(leads)
-    print(f"Found {total} leads for followup processing.")
-    now = datetime.utcnow()
-
-    for idx, lead in enumerate(leads, start=1):
-        (lead_id, email, domain_name, first_name, vertical,
-         status, opened, replied, last_email_sent_at,
-         followup_count, tracking_id) = lead
-
-        try:
-            if not last_email_sent_at:
-                last_dt = now - timedelta(days=10)
-            else:
-                last_dt = datetime.fromisoformat(last_email_sent_at)
-
-            days_since = (now - last_dt).days
-
-            if replied:
-                progress_bar(idx, total, prefix="Followups")
+    metrics.reset()
+    _recover_outbox()
+    suppressions = load_suppressions()
+    load_sender_usage()
+    with LeadLease(WORKER_ID) as lease:
+        with sender_pool, post_send:
+            _followup_pass(lease, MAX_EMAILS_PER_RUN, suppressions)
+    export_metrics()
+
+
+def _initial_pass(lease, limit, suppressions):
+    zones = _open_zones_or_report()
+    if zones is None or _quotas_exhausted():
+        return 0
+    leads = lease.claim_initial(limit, zones)
+    print(f"Found {len(leads)} leads for initial send.")
+    return _plan_and_send(leads, ("initial",), "Sending initial emails", suppressions, _plan_initial)
+
+
+def _followup_pass(lease, limit, suppressions):
+    zones = _open_zones_or_report()
+    if zones is None or _quotas_exhausted():
+        return 0
+    leads = lease.claim_followups(limit, zones)
+    print(f"Found {len(leads)} leads for followup processing.")
+    return _plan_and_send(leads, ("resend", "followup"), "Followups", suppressions, _plan_followup)
+
+
+def action_worker(kinds=("initial", "followups"), max_leads=0):
+    # Claims and sends batches until nothing is due (or max_leads is
+    # reached). Any number of workers can run against the same database.
+    print(f"Worker {WORKER_ID} starting: {', '.join(kinds)}, batches of {WORKER_BATCH_SIZE}.")
+    metrics.reset()
+    _recover_outbox()
+    suppressions = load_suppressions()
+    load_sender_usage()
+    with LeadLease(WORKER_ID) as lease, sender_pool:
+        handled = _work_batches(lease, kinds, suppressions, max_leads)
+    print(f"Worker {WORKER_ID} done: {handled} leads handled.")
+    export_metrics()
+
+
+def _work_batches(lease, kinds, suppressions, max_leads=0):
+    # Batches until nothing is due, max_leads is reached or the scheduler is
+    # asked to stop. Returns the number of leads handled.
+    handled = 0
+    while (not max_leads or handled < max_leads) and not send_scheduler.stopping.is_set():
+        limit = WORKER_BATCH_SIZE if not max_leads else min(WORKER_BATCH_SIZE, max_leads - handled)
+        progressed = 0
+        with post_send:
+            if "initial" in kinds:
+                progressed += _initial_pass(lease, limit, suppressions)
+            if "followups" in kinds:
+                progressed += _followup_pass(lease, limit, suppressions)
+        # bookkeeping is flushed before the leads are handed back
+        lease.release()
+        if not progressed:
+            break
+        handled += progressed
+    return handled
+
+
+def _open_zones_or_report():
+    zones = open_zones()
+    if zones:
+        return zones
+    wait = send_windows.seconds_until_next_open()
+    when = f"; the next one opens in {wait / 60:.0f} min" if wait is not None else ""
+    print(f"No recipient send window is open{when}.")
+    return None
+
+
+def _quotas_exhausted():
+    if not sender_pool.exhausted():
+        return False
+    print("All sender quotas are used up; stopping until they reset.")
+    return True
+
+
+def _plan_and_send(leads, kinds, label, suppressions, plan):
+    # Gives every claimed lead a sender slot, renders the ones that have
+    # nothing queued yet and sends. A lead stays on the account it was first
+    # written from; leads whose account is out of quota are left for a
+    # later run. Returns the number of leads dealt with.
+    lead_ids = [lead.id for lead in leads]
+    queued = {row[1]: row for row in get_queued_outbox(kinds, len(lead_ids) * len(kinds), lead_ids)}
+    senders = get_lead_senders(lead_ids)
+
+    messages = []
+    blocked = []
+    ready = {}
+    deferred = 0
+    for lead in leads:
+        lead_id, email = lead.id, lead.email
+        entry = _suppression_entry(suppressions, email, "suppressed before send")
+        if entry:
+            blocked.append(entry)
+            continue
+        row = queued.get(lead_id)
+        slot = sender_pool.acquire(row[9] if row and row[9] else senders.get(lead_id))
+        if slot is None:
+            deferred += 1
+            continue
+        if row is None:
+            try:
+                planned = plan(lead, slot.account)
+            except Exception:
+                print(f"\nError preparing email for {email}. Continuing with next.")
+                traceback.print_exc()
+                planned = None
+            if not planned:
+                sender_pool.release(slot)
                 continue
+            messages.append(planned)
+        ready[lead_id] = slot
+    _skip_suppressed(blocked)
+    if deferred:
+        metrics.inc("deferred", deferred)
+        print(f"Left {deferred} leads for later: their sender quota is used up.")
+    queue_outbox(messages)
+
+    _send_outbox(kinds, label, suppressions, ready)
+    return len(ready) + len(blocked)
+
+
+def _skip_suppressed(entries):
+    # re-adding an existing suppression is a no-op insert, but it takes the
+    # lead out of the send queues so it stops being selected
+    if entries:
+        add_suppressions(entries, source="send")
+        metrics.inc("skipped", len(entries))
+        print(f"Skipped {len(entries)} suppressed recipients.")
+
+
+def _plan_initial(lead, account):
+    subject = initial_subject(lead.domain_name, lead.vertical)
+    html = get_initial_template_html(lead.vertical, lead.template_index, lead.first_name,
+                                     lead.domain_name, tracking_token(lead.id, "initial", 0),
+                                     from_name=account.from_name)
+    return _outbox_message(lead.id, "initial", 0, lead.email, subject, html, account)
+
+
+def _plan_followup(lead, account):
+    # timing is decided in SQL (next_action_at); only the kind of email is
+    # left to pick here
+    if lead.replied:
+        return None
+    sequence = lead.followup_count + 1
+
+    if lead.next_action == "resend":
+        subject = initial_subject(lead.domain_name, lead.vertical)
+        html = get_initial_template_html(lead.vertical, 0, lead.first_name, lead.domain_name,
+                                         tracking_token(lead.id, "resend", sequence),
+                                         from_name=account.from_name)
+        return _outbox_message(lead.id, "resend", sequence, lead.email, subject, html, account)
+
+    if lead.next_action == "followup":
+        subject = followup_subject(lead.domain_name, sequence)
+        html = followup_email_html(lead.first_name, lead.domain_name,
+                                   tracking_token(lead.id, "followup", sequence), sequence,
+                                   from_name=account.from_name)
+        return _outbox_message(lead.id, "followup", sequence, lead.email, subject, html, account)
+
+    return None
+
+
+def _describe_send(kind, sequence, email):
+    if kind == "initial":
+        return f"Sent initial email to {email}"
+    if kind == "resend":
+        return f"Resent main email to {email} (no open yet)"
+    return f"Sent follow-up #{sequence} to {email}"
+
+
+def _recover_outbox():
+    # before planning, so a lead whose last send was interrupted is not
+    # picked up again
+    recovered = recover_interrupted_outbox()
+    if recovered:
+        print(f"Found {recovered} interrupted sends from an earlier run.")
+
+
+def _send_outbox(kinds, label, suppressions, slots):
+    # slots: lead id -> sender_pool Reservation held for that lead
+    # at most one queued row per lead and kind
+    rows = get_queued_outbox(kinds, len(slots) * len(kinds), list(slots))
+    # rows queued by an earlier run may have bounced since
+    runnable = []
+    for row in rows:
+        if suppressions.is_suppressed(row[4]):
+            cancel_outbox(row[0], "recipient suppressed")
+            sender_pool.release(slots[row[1]])
+            metrics.inc("skipped")
+        else:
+            runnable.append(row)
+    rows = runnable
+    total = len(rows)
+    progress = {"done": 0}
+
+    def job_for(row):
+        (outbox_id, lead_id, kind, sequence, email, subject, html,
+         message_id, attempts, sender_account) = row
+        slot = slots[lead_id]
+        account = slot.account
+
+        def job():
+            if not claim_outbox(outbox_id, WORKER_ID):
+                sender_pool.release(slot)
+                metrics.inc("skipped")
+                send_scheduler.log(f"\nSkipping {email}: already claimed by another run")
+                return
+            try:
+                send_email(email, subject, html, message_id=message_id, account=account)
+            except Exception as e:
+                sender_pool.release(slot)
+                permanent = is_permanent_failure(e)
+                release_outbox(outbox_id, e, retry=not permanent)
+                metrics.inc("failed")
+                if not permanent:
+                    metrics.inc("retried")
+                if permanent and isinstance(e, smtplib.SMTPRecipientsRefused):
+                    # the server refused this recipient outright (5xx); a 4xx
+                    # refusal is retried like any other temporary failure
+                    add_suppressions([(email, "address", str(e)[:500])], source="smtp")
+                raise
+            new_status, increment, bump_template = OUTBOX_KIND_UPDATES[kind]
+            post_send.record(lead_id, new_status, followup_increment=increment,
+                             bump_template=bump_template, message_id=message_id,
+                             outbox_id=outbox_id, sender_account=account.name)
+            metrics.inc("sent")
+            send_scheduler.log(f"\n{_describe_send(kind, sequence, email)}")
+
+        return email, job
+
+    def on_done(email, ok):
+        progress["done"] += 1
+        progress_bar(progress["done"], total, prefix=label)
+
+    send_scheduler.run((job_for(row) for row in rows), on_done)
 
-            if not opened:
-                if days_since >= RESEND_MAIN_AFTER_DAYS:
-                    subject = initial_subject(domain_name, vertical)
-                    html = get_initial_template_html(vertical, 0, first_name, domain_name, tracking_id)
-                    send_email(email, subject, html)
-                    update_after_send(lead_id, "initial_sent", followup_increment=True)
-                    print(f"\nResent main email to {email} (no open yet) for {domain_name}")
-                    human_delay()
-                progress_bar(idx, total, prefix="Followups")
-                continue
 
-            if opened and not replied:
-                if days_since >= FOLLOWUP_AFTER_DAYS:
-                    subject = followup_subject(domain_name, followup_count + 1)
-                    html = followup_email_html(first_name, domain_name, tracking_id, followup_count + 1)
-                    send_email(email, subject, html)
-                    update_after_send(lead_id, "followup", followup_increment=True)
-                    print(f"\nSent follow-up #{followup_count + 1} to {email} for {domain_name}")
-                    human_delay()
+# =========================
+# Render-only export
+# =========================
+#
+# Same selection, templates, subjects and pixels as send_initial and
+# run_followups, but every message is written to an mbox file or a
+# directory of .eml files instead of going to SMTP. Nothing is claimed,
+# queued or marked as sent, so an export can be repeated at will. Large
+# batches are rendered across a process pool; the parent only writes.
+
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", os.cpu_count() or 1))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 500))
+
+EXPORT_PLANS = {"initial": _plan_initial, "followups": _plan_followup}
+
+
+def _render_export_chunk(task):
+    # Runs in a pool process (or inline). task: (pass name, [(lead, account
+    # name)]). Returns [(file name, envelope sender, message bytes)].
+    plan = EXPORT_PLANS[task[0]]
+    rendered = []
+    for lead, account_name in task[1]:
+        account = sender_pool.get(account_name)
+        message = plan(lead, account)
+        if not message:
+            continue
+        _, raw = account.builder.build(message["to_email"], message["subject"],
+                                       message["body_html"], message["message_id"])
+        name = f"{message['lead_id']}-{message['kind']}-{message['sequence']}"
+        rendered.append((name, account.from_email, raw))
+    return rendered
+
+
+def action_export(pass_name, path, compress=False, limit=None):
+    metrics.reset()
+    limit = limit or MAX_EMAILS_PER_RUN
+    zones = open_zones()
+    if pass_name == "initial":
+        leads = get_leads_for_initial_send(limit, zones)
+    else:
+        leads = get_leads_for_followup(limit, zones)
+    print(f"Rendering up to {limit} {pass_name} messages to {path}...")
+    # leads are streamed from the cursor and rendered chunk by chunk, so
+    # memory stays flat however many are selected
+    tasks = _export_tasks(pass_name, leads, load_suppressions())
+
+    started = time.perf_counter()
+    with open_export(path, compress) as export:
+        if EXPORT_WORKERS > 1 and limit > EXPORT_CHUNK_SIZE:
+            # render timings from pool processes are not merged into this
+            # run's metrics; the totals below cover the whole export
+            with ProcessPoolExecutor(max_workers=EXPORT_WORKERS) as pool:
+                _write_export(export, _map_bounded(pool, _render_export_chunk, tasks, EXPORT_WORKERS * 2))
+        else:
+            _write_export(export, map(_render_export_chunk, tasks))
+    seconds = time.perf_counter() - started
+
+    rate = export.count / seconds if seconds else 0
+    print(f"\nExported {export.count} messages ({export.bytes / 1_048_576:.1f} MB) "
+          f"to {export.path} in {seconds:.2f}s, {rate:.0f} messages/s.")
+    export_metrics()
+
+
+def _export_tasks(pass_name, leads, suppressions):
+    # (pass name, [(lead, account name)]) per EXPORT_CHUNK_SIZE leads
+    chunk = []
+    for lead in leads:
+        if not suppressions.is_suppressed(lead.email):
+            chunk.append(lead)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield pass_name, _with_accounts(chunk)
+            chunk = []
+    if chunk:
+        yield pass_name, _with_accounts(chunk)
+
+
+def _with_accounts(leads):
+    # same account choice as a real send, without taking quota slots
+    senders = get_lead_senders(lead.id for lead in leads)
+    items = []
+    for lead in leads:
+        preferred = senders.get(lead.id)
+        account = sender_pool.choose(preferred) or sender_pool.get(preferred)
+        items.append((lead, account.name))
+    return items
+
+
+def _map_bounded(pool, func, tasks, window):
+    # like pool.map, in order, but with at most `window` tasks in flight
+    # instead of submitting the whole iterable up front
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(func, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _write_export(export, results):
+    for rendered in results:
+        with metrics.timer("export_write"):
+            for name, sender, raw in rendered:
+                export.write(name, sender, raw)
+        sys.stdout.write(f"\rExporting: {export.count} messages")
+        sys.stdout.flush()
+
+
+def export_metrics(verbose=True, title="Run metrics"):
+    # Each send, worker or export action starts from zero, so its output is
+    # per run. The daemon never resets: its files hold totals since start,
+    # as Prometheus counters should.
+    if METRICS_PROM_FILE:
+        metrics.write_prometheus(METRICS_PROM_FILE)
+    if METRICS_JSON_FILE:
+        metrics.write_json(METRICS_JSON_FILE)
+    summary = metrics.summary()
+    if not verbose or not summary["phases"]:
+        return
+    counters = ", ".join(f"{name} {value}" for name, value in summary["counters"].items())
+    print(f"\n{title}: {counters or 'no events'}")
+    for phase, stats in summary["phases"].items():
+        print(f"  {phase:<20} n={stats['count']:<7} total {stats['total_seconds']:.2f}s  "
+              f"p50 {stats['p50_ms']}ms  p99 {stats['p99_ms']}ms")
 
-            progress_bar(idx, total, prefix="Followups")
 
-        except Exception:
-            print(f"\nError processing followup for {email}. Continuing with next.")
-            traceback.print_exc()
-            progress_bar(idx, total, prefix="Followups")
+def action_outbox_status():
+    counts = get_outbox_counts()
+    if not counts:
+        print("Outbox is empty.")
+        return
+    for state in ("queued", "sending", "sent", "failed"):
+        print(f"{state}: {counts.get(state, 0)}")
+    stats = get_message_open_stats()
+    if stats:
+        print("Opens by message:")
+        for kind, sequence, sent, opened in stats:
+            label = kind if kind == "initial" else f"{kind} #{sequence}"
+            print(f"  {label:<14} {opened}/{sent} opened ({opened / sent:.0%})")
 
 
 # =========================
 # Reporting
 # =========================
 
-def action_generate_report():
-    leads = get_all_leads()
-    total = len(leads)
+def action_generate_report(incremental=False):
+    # Watermark is taken before reading so nothing updated mid-report is missed
+    # by the next incremental run (at worst a lead appears in both).
+    watermark = sql_now()
+    since = get_meta(REPORT_WATERMARK) if incremental else None
+
+    total, opened_count, replied_count, total_followups = get_report_summary()
     if total == 0:
         print("No leads found in database.")
         return
 
-    opened_count = sum(1 for l in leads if l[3] == 1)
-    replied_count = sum(1 for l in leads if l[4] == 1)
-    total_followups = sum(l[5] for l in leads)
     not_opened = total - opened_count
 
     open_rate = (opened_count / total) * 100 if total else 0
@@ -744,18 +902,27 @@ def action_generate_report():
     print("===================================\n")
 
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    report_filename = f"report_{timestamp}.csv"
+    report_filename = f"report_{timestamp}.csv" if since is None else f"report_{timestamp}_incremental.csv"
 
+    sample = []
+    written = 0
     with open(report_filename, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow(["email", "domain_name", "vertical", "opened", "replied",
-                         "followup_count", "last_email_sent_at", "status"])
-        for row in leads:
+        writer.writerow(REPORT_COLUMNS)
+        for row in iter_report_rows(since=since):
             writer.writerow(row)
+            written += 1
+            if len(sample) < 5:
+                sample.append(row)
 
-    print(f"Detailed report saved to: {report_filename}")
+    set_meta(REPORT_WATERMARK, watermark)
+
+    if since is None:
+        print(f"Detailed report saved to: {report_filename}")
+    else:
+        print(f"{written} leads changed since {since}; saved to: {report_filename}")
     print("\nSample rows:")
-    for row in leads[:5]:
+    for row in sample:
         email, domain, vertical, opened, replied, followup_count, last_sent, status = row
         print("--------------------------------------")
         print(f"Email: {email}")
@@ -769,6 +936,209 @@ def action_generate_report():
     print("--------------------------------------")
 
 
+# =========================
+# Open log replay
+# =========================
+
+TID_PATTERNS = [
+    re.compile(r"[?&]tid=([^&\s\"'\\]+)"),
+    re.compile(r"Pixel hit with TID: ([^\s\"'\\]+)"),
+]
+TIMESTAMP_KEYS = ("timestamp", "time", "ts", "date", "opened_at")
+ACCESS_LOG_TIME = re.compile(r"\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2} [+-]\d{4})\]")
+
+
+def _opens_from_log(path):
+    # Yields (tracking_id, opened_at) from a pixel log export: JSON lines
+    # (tid/url/message fields plus a timestamp) or plain text access logs.
+    # Lines without a timestamp are recorded as "now", so only those are not
+    # de-duplicated when a log is replayed twice.
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            opened_at = None
+            tid = None
+            if line.lstrip().startswith("{"):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    tid = record.get("tid")
+                    for key in TIMESTAMP_KEYS:
+                        opened_at = parse_open_timestamp(record.get(key))
+                        if opened_at:
+                            break
+            if not tid:
+                for pattern in TID_PATTERNS:
+                    m = pattern.search(line)
+                    if m:
+                        tid = unquote(m.group(1))
+                        break
+            if tid and not opened_at:
+                m = ACCESS_LOG_TIME.search(line)
+                if m:
+                    dt = datetime.strptime(m.group(1), "%d/%b/%Y:%H:%M:%S %z")
+                    opened_at = dt.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+            if tid:
+                yield tid, opened_at
+
+
+def action_replay_opens(log_path):
+    if not os.path.exists(log_path):
+        print(f"Log file not found: {log_path}")
+        return
+
+    events = 0
+    leads_updated = 0
+    batch = []
+    for event in _opens_from_log(log_path):
+        batch.append(event)
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            leads_updated += record_opens(batch, source="replay")
+            events += len(batch)
+            batch = []
+    if batch:
+        leads_updated += record_opens(batch, source="replay")
+        events += len(batch)
+    print(f"Replayed {events} open events from {log_path}; {leads_updated} lead updates applied.")
+
+
+# =========================
+# Reply sync
+# =========================
+
+def action_sync_replies():
+    syncer = ImapReplySync(IMAP_HOST, IMAP_PORT, IMAP_USER, IMAP_PASSWORD,
+                           folders=IMAP_FOLDERS, use_ssl=IMAP_USE_SSL)
+    try:
+        scanned, marked = syncer.sync(get_meta, find_leads_by_message_ids, record_replies)
+    except Exception as e:
+        print(f"Reply sync failed: {e}")
+        return
+    if scanned == 0:
+        print("No new messages.")
+        return
+    print(f"Reply sync: {scanned} new messages, {marked} leads marked as replied.")
+
+
+# =========================
+# Bounce ingestion
+# =========================
+
+def _own_addresses():
+    return [SMTP_EMAIL, IMAP_USER] + [account.from_email for account in sender_pool.accounts.values()]
+
+
+def action_ingest_bounces(path):
+    # DSN/NDR messages from a .eml file, an mbox file or a directory of .eml
+    if not os.path.exists(path):
+        print(f"Bounce file not found: {path}")
+        return
+    bounces = 0
+    failures = []
+    for raw in iter_bounce_files(path):
+        found = parse_bounce(raw, _own_addresses())
+        bounces += bool(found)
+        failures.extend(found)
+    added = add_suppressions(failures)
+    print(f"Bounce ingest: {bounces} bounces, {len(failures)} failed recipients, "
+          f"{added} new suppressions.")
+
+
+def action_sync_bounces():
+    syncer = ImapBounceSync(IMAP_HOST, IMAP_PORT, IMAP_USER, IMAP_PASSWORD,
+                            folders=IMAP_FOLDERS, use_ssl=IMAP_USE_SSL)
+    try:
+        bounces, added = syncer.sync(get_meta, add_suppressions, _own_addresses())
+    except Exception as e:
+        print(f"Bounce sync failed: {e}")
+        return
+    print(f"Bounce sync: {bounces} bounces, {added} new suppressions.")
+
+
+# =========================
+# Index check
+# =========================
+
+def action_check_indexes():
+    all_ok = True
+    for name, index, uses_index, plan in check_query_plans():
+        all_ok = all_ok and uses_index
+        print(f"[{'OK' if uses_index else 'FAIL'}] {name}: expected {index}")
+        for detail in plan:
+            print(f"      {detail}")
+    return all_ok
+
+
+# =========================
+# Daemon mode
+# =========================
+#
+# One resident process instead of cron runs: the database connection, the
+# compiled templates and each sender's SMTP sessions stay open between
+# passes. Initial sends and follow-ups run whenever something becomes due
+# (a commit from another process, e.g. an import, wakes them early);
+# reply and bounce sync run on their own intervals. SIGTERM lets in-flight
+# sends finish, flushes their bookkeeping and releases claimed leads;
+# anything queued but not yet sent stays in the outbox for the next start.
+
+def _seconds_until(timestamp):
+    return (datetime.fromisoformat(timestamp) - datetime.utcnow()).total_seconds()
+
+
+def action_daemon():
+    print(f"Daemon {WORKER_ID} starting.")
+    _recover_outbox()
+    last_version = {"value": data_version()}
+
+    def changed():
+        version = data_version()
+        if version == last_version["value"]:
+            return False
+        last_version["value"] = version
+        return True
+
+    daemon = Daemon(poll_seconds=DAEMON_POLL_SECONDS, changed=changed)
+    daemon.on_stop(send_scheduler.stop)
+    daemon.install_signal_handlers()
+
+    with LeadLease(WORKER_ID) as lease, sender_pool:
+        def send_task(kind):
+            def run():
+                suppressions = load_suppressions()
+                load_sender_usage()
+                handled = _work_batches(lease, (kind,), suppressions)
+                export_metrics(verbose=False)
+                # sleep until a closed send window opens, a quota hour
+                # rolls over or (follow-ups) the next one falls due; new
+                # leads wake the task early. Nothing known: the interval.
+                delays = [send_windows.seconds_until_next_open()]
+                if sender_pool.exhausted():
+                    now = datetime.utcnow()
+                    delays.append(3600 - now.minute * 60 - now.second)
+                next_at = get_next_action_at() if kind == "followups" else None
+                if next_at:
+                    delay = _seconds_until(next_at)
+                    # one already due but not claimable waits the interval
+                    if delay > 0 or handled:
+                        delays.append(delay)
+                delays = [d for d in delays if d is not None]
+                return min(delays) if delays else None
+            return run
+
+        daemon.add("initial", send_task("initial"), DAEMON_SEND_INTERVAL, wake_on_change=True)
+        daemon.add("followups", send_task("followups"), DAEMON_SEND_INTERVAL, wake_on_change=True)
+        if IMAP_USER and DAEMON_REPLY_SYNC_INTERVAL:
+            daemon.add("sync_replies", action_sync_replies, DAEMON_REPLY_SYNC_INTERVAL)
+        if IMAP_USER and DAEMON_BOUNCE_SYNC_INTERVAL:
+            daemon.add("sync_bounces", action_sync_bounces, DAEMON_BOUNCE_SYNC_INTERVAL)
+        daemon.run()
+
+    export_metrics(title="Metrics since start")
+    close_connection()
+    print(f"Daemon {WORKER_ID} stopped.")
+
+
 # =========================
 # Seed example leads
 # =========================
@@ -793,9 +1163,24 @@ def print_usage():
     print("  python email_automation.py init_db")
     print("  python email_automation.py import_csv leads.csv")
     print("  python email_automation.py seed_example")
-    print("  python email_automation.py send_initial")
-    print("  python email_automation.py run_followups")
-    print("  python email_automation.py report")
+    print("  python email_automation.py send_initial [--export out.mbox|out_dir] [--gzip] [--limit N]")
+    print("  python email_automation.py run_followups [--export out.mbox|out_dir] [--gzip] [--limit N]")
+    print("  python email_automation.py report [--incremental]")
+    print("  python email_automation.py replay_opens pixel_log.jsonl")
+    print("  python email_automation.py worker [initial|followups] [max_leads]")
+    print("  python email_automation.py sync_replies")
+    print("  python email_automation.py sync_bounces")
+    print("  python email_automation.py ingest_bounces bounces.mbox")
+    print("  python email_automation.py outbox")
+    print("  python email_automation.py daemon")
+    print("  python email_automation.py check_indexes")
+
+
+def _option(args, name):
+    # value following a --flag, or None
+    if name in args and args.index(name) + 1 < len(args):
+        return args[args.index(name) + 1]
+    return None
 
 
 if __name__ == "__main__":
@@ -816,11 +1201,48 @@ if __name__ == "__main__":
             import_from_csv(sys.argv[2])
     elif cmd == "seed_example":
         seed_example()
-    elif cmd == "send_initial":
-        action_send_initial()
-    elif cmd == "run_followups":
-        action_run_followups()
+    elif cmd in ("send_initial", "run_followups"):
+        args = sys.argv[2:]
+        if "--export" in args:
+            # render-only: write the messages to disk, send nothing
+            path = _option(args, "--export")
+            limit = _option(args, "--limit")
+            if not path:
+                print("Please provide an export path (file.mbox or a directory).")
+            else:
+                action_export("initial" if cmd == "send_initial" else "followups", path,
+                              compress="--gzip" in args, limit=int(limit) if limit else None)
+        elif cmd == "send_initial":
+            action_send_initial()
+        else:
+            action_run_followups()
     elif cmd == "report":
-        action_generate_report()
+        action_generate_report(incremental="--incremental" in sys.argv[2:])
+    elif cmd == "replay_opens":
+        if len(sys.argv) < 3:
+            print("Please provide the pixel log path.")
+        else:
+            action_replay_opens(sys.argv[2])
+    elif cmd == "worker":
+        args = sys.argv[2:]
+        kinds = tuple(a for a in args if a in ("initial", "followups")) or ("initial", "followups")
+        max_leads = next((int(a) for a in args if a.isdigit()), 0)
+        action_worker(kinds, max_leads)
+    elif cmd == "sync_replies":
+        action_sync_replies()
+    elif cmd == "sync_bounces":
+        action_sync_bounces()
+    elif cmd == "ingest_bounces":
+        if len(sys.argv) < 3:
+            print("Please provide a .eml file, mbox file or directory.")
+        else:
+            action_ingest_bounces(sys.argv[2])
+    elif cmd == "outbox":
+        action_outbox_status()
+    elif cmd == "daemon":
+        action_daemon()
+    elif cmd == "check_indexes":
+        if not action_check_indexes():
+            sys.exit(1)
     else:
         print_usage()
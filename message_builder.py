@@ -0,0 +1,69 @@
+import base64
+import secrets
+from email.header import Header
+from email.utils import formataddr, formatdate
+
+
+# =========================
+# Pre-encoded MIME message builder
+# =========================
+#
+# Everything that is the same for every message in a run (From, MIME-Version,
+# the multipart boundary and the part headers) is encoded to bytes once.
+# Each message is then a handful of per-recipient headers plus the base64
+# body, joined straight into the bytes handed to SMTP.
+
+CRLF = b"\r\n"
+
+
+def _encode_header_value(value):
+    if "\r" in value or "\n" in value:
+        raise ValueError(f"Header value contains a line break: {value!r}")
+    if value.isascii():
+        return value.encode("ascii")
+    return Header(value, "utf-8").encode(linesep="\r\n").encode("ascii")
+
+
+class MessageBuilder:
+    def __init__(self, from_name, from_email):
+        self.from_email = from_email
+        self.id_domain = (from_email or "localhost").rsplit("@", 1)[-1]
+
+        boundary = "=_" + secrets.token_hex(16)
+        # formataddr RFC 2047-encodes a non-ASCII display name
+        from_header = formataddr((from_name, from_email or ""))
+
+        self._head = b"".join([
+            b"From: ", _encode_header_value(from_header), CRLF,
+            b"MIME-Version: 1.0", CRLF,
+            b'Content-Type: multipart/alternative; boundary="', boundary.encode("ascii"), b'"', CRLF,
+        ])
+        self._html_part_head = b"".join([
+            CRLF,
+            b"--", boundary.encode("ascii"), CRLF,
+            b'Content-Type: text/html; charset="utf-8"', CRLF,
+            b"Content-Transfer-Encoding: base64", CRLF,
+            CRLF,
+        ])
+        self._tail = b"".join([b"--", boundary.encode("ascii"), b"--", CRLF])
+
+    def new_message_id(self):
+        return f"<{secrets.token_hex(12)}@{self.id_domain}>"
+
+    def build(self, to_email, subject, html_body, message_id=None):
+        # Returns (message_id, message bytes ready for SMTP DATA).
+        if message_id is None:
+            message_id = self.new_message_id()
+
+        lines = [
+            self._head,
+            b"To: ", _encode_header_value(to_email), CRLF,
+            b"Subject: ", _encode_header_value(subject), CRLF,
+            b"Date: ", formatdate(usegmt=True).encode("ascii"), CRLF,
+            b"Message-ID: ", message_id.encode("ascii"), CRLF,
+            self._html_part_head,
+            base64.encodebytes(html_body.encode("utf-8")).replace(b"\n", CRLF),
+            CRLF,
+            self._tail,
+        ]
+        return message_id, b"".join(lines)
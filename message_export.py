@@ -0,0 +1,89 @@
+import os
+import re
+import gzip
+import time
+
+
+# =========================
+# Render-only message export
+# =========================
+#
+# Writes fully built messages (the exact bytes that would go to SMTP DATA)
+# to disk instead of sending them: either one mbox file or a directory with
+# one .eml per message, optionally gzip-compressed. A path ending in .mbox
+# (or .mbox.gz) selects mbox, anything else is a directory.
+
+# mboxrd: every "From " line, quoted or not, gets one more ">"
+FROM_LINE_RE = re.compile(rb"^(>*From )", re.MULTILINE)
+
+
+def _mbox_body(raw):
+    # mbox files use bare LF line endings
+    return FROM_LINE_RE.sub(rb">\1", raw.replace(b"\r\n", b"\n"))
+
+
+class MboxExport:
+    def __init__(self, path, compress=False, compresslevel=6):
+        if compress and not path.endswith(".gz"):
+            path += ".gz"
+        self.path = path
+        self.count = 0
+        self.bytes = 0
+        if compress:
+            self._file = gzip.open(path, "wb", compresslevel=compresslevel)
+        else:
+            self._file = open(path, "wb")
+
+    def write(self, name, sender, raw):
+        separator = f"From {sender or 'MAILER-DAEMON'} {time.asctime(time.gmtime())}\n".encode("ascii")
+        body = _mbox_body(raw)
+        self._file.write(separator)
+        self._file.write(body)
+        self._file.write(b"\n" if body.endswith(b"\n") else b"\n\n")
+        self.count += 1
+        self.bytes += len(raw)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EmlDirExport:
+    def __init__(self, path, compress=False, compresslevel=6):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.compress = compress
+        self.compresslevel = compresslevel
+        self.count = 0
+        self.bytes = 0
+
+    def write(self, name, sender, raw):
+        file_path = os.path.join(self.path, f"{name}.eml")
+        if self.compress:
+            with gzip.open(file_path + ".gz", "wb", compresslevel=self.compresslevel) as f:
+                f.write(raw)
+        else:
+            with open(file_path, "wb") as f:
+                f.write(raw)
+        self.count += 1
+        self.bytes += len(raw)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_export(path, compress=False):
+    if path.endswith((".mbox", ".mbox.gz")):
+        return MboxExport(path, compress=compress or path.endswith(".gz"))
+    return EmlDirExport(path, compress=compress)
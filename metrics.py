@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+
+# =========================
+# Run metrics
+# =========================
+#
+# Per-phase latency histograms (fixed buckets, Prometheus style) and event
+# counters for a send run. Recording is a perf_counter pair, a bisect and an
+# increment under a lock, so it stays on in production. Exported at the end
+# of a run as a Prometheus textfile and/or a JSON summary.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# seconds; covers a sub-millisecond render up to a slow SMTP handshake
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("metrics", "phase", "started")
+
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.phase, time.perf_counter() - self.started)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    def __init__(self, enabled=METRICS_ENABLED, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    # --- recording ---
+
+    def observe(self, phase, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(phase)
+            if histogram is None:
+                histogram = self._histograms[phase] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def timer(self, phase):
+        # with metrics.timer("render"): ...
+        return _Timer(self, phase) if self.enabled else _NULL_TIMER
+
+    def timed(self, phase):
+        # decorator form of timer()
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(phase):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def inc(self, counter, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self.started = time.time()
+
+    # --- export ---
+
+    def summary(self):
+        with self._lock:
+            phases = {
+                phase: {
+                    "count": h.count,
+                    "total_seconds": round(h.sum, 6),
+                    "mean_ms": round(h.sum / h.count * 1000, 3) if h.count else None,
+                    "p50_ms": round(h.quantile(0.5) * 1000, 3),
+                    "p90_ms": round(h.quantile(0.9) * 1000, 3),
+                    "p99_ms": round(h.quantile(0.99) * 1000, 3),
+                    "max_ms": round(h.max * 1000, 3),
+                }
+                for phase, h in sorted(self._histograms.items())
+            }
+            counters = dict(sorted(self._counters.items()))
+        return {
+            "started_at": self.started,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "phases": phases,
+            "counters": counters,
+        }
+
+    def to_prometheus(self, prefix="email"):
+        lines = [
+            f"# HELP {prefix}_phase_seconds Latency of each send-run phase.",
+            f"# TYPE {prefix}_phase_seconds histogram",
+        ]
+        with self._lock:
+            for phase, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, n in zip(h.bounds, h.counts):
+                    cumulative += n
+                    lines.append(f'{prefix}_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {h.count}')
+                lines.append(f'{prefix}_phase_seconds_sum{{phase="{phase}"}} {h.sum:.6f}')
+                lines.append(f'{prefix}_phase_seconds_count{{phase="{phase}"}} {h.count}')
+            lines.append(f"# HELP {prefix}_events_total Send-run events (sent, failed, skipped, retried).")
+            lines.append(f"# TYPE {prefix}_events_total counter")
+            for counter, value in sorted(self._counters.items()):
+                lines.append(f'{prefix}_events_total{{event="{counter}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        _write_atomic(path, self.to_prometheus())
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.summary(), indent=2))
+
+
+def _write_atomic(path, text):
+    # node_exporter's textfile collector must never see a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# one registry per process, shared by the sender, the pool and the db layer
+metrics = Metrics()
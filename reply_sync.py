@@ -0,0 +1,165 @@
+import re
+import imaplib
+from email.parser import BytesHeaderParser
+from email.utils import getaddresses
+
+
+# =========================
+# Incremental IMAP reply sync
+# =========================
+#
+# Remembers the highest UID seen per folder (with the folder's UIDVALIDITY)
+# and only ever fetches the headers of messages above it. A STATUS call is
+# made first, so a folder without new mail costs one round trip. Replies are
+# matched to leads by In-Reply-To/References against the Message-IDs we
+# sent, falling back to the sender address.
+
+HEADER_FIELDS = "MESSAGE-ID IN-REPLY-TO REFERENCES FROM AUTO-SUBMITTED CONTENT-TYPE"
+FETCH_CHUNK = 500
+
+MSGID_RE = re.compile(r"<[^<>\s]+>")
+STATUS_RE = re.compile(rb"(UIDNEXT|UIDVALIDITY) (\d+)")
+UID_RE = re.compile(rb"UID (\d+)")
+
+# delivery reports are not replies (see bounce handling)
+NON_REPLY_SENDERS = ("mailer-daemon@", "postmaster@")
+
+
+def _quote(folder):
+    return '"' + folder.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _is_automatic(headers):
+    sender = (headers.get("From") or "").lower()
+    if any(marker in sender for marker in NON_REPLY_SENDERS):
+        return True
+    if (headers.get("Auto-Submitted") or "no").strip().lower() != "no":
+        return True
+    return "multipart/report" in (headers.get("Content-Type") or "").lower()
+
+
+class ImapReplySync:
+    # meta key prefix for the per-folder "uidvalidity:last_uid" watermark
+    watermark_prefix = "imap_uid"
+
+    def __init__(self, host, port, username, password, folders=("INBOX",), use_ssl=True,
+                 timeout=30, connect=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.folders = list(folders)
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        # factory returning an imaplib.IMAP4-compatible object; lets a local
+        # stand-in server or a fake client be plugged in
+        self._connect_factory = connect
+        self._parser = BytesHeaderParser()
+
+    def _connect(self):
+        if self._connect_factory:
+            conn = self._connect_factory()
+        elif self.use_ssl:
+            conn = imaplib.IMAP4_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = imaplib.IMAP4(self.host, self.port, timeout=self.timeout)
+        conn.login(self.username, self.password)
+        return conn
+
+    def watermark_key(self, folder):
+        return f"{self.watermark_prefix}:{folder}"
+
+    def _status(self, conn, folder):
+        typ, data = conn.status(_quote(folder), "(UIDNEXT UIDVALIDITY)")
+        if typ != "OK" or not data:
+            raise imaplib.IMAP4.error(f"STATUS {folder} failed: {data!r}")
+        values = dict(STATUS_RE.findall(data[0]))
+        return int(values[b"UIDVALIDITY"]), int(values[b"UIDNEXT"])
+
+    def _new_uids(self, conn, folder, last_uid):
+        typ, data = conn.select(_quote(folder), readonly=True)
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"SELECT {folder} failed: {data!r}")
+        typ, data = conn.uid("SEARCH", None, f"UID {last_uid + 1}:*")
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"UID SEARCH in {folder} failed: {data!r}")
+        # "n:*" always matches the newest message, even when its UID < n
+        return [uid for uid in (int(u) for u in b" ".join(data).split()) if uid > last_uid]
+
+    def _pending(self, conn, folder, get_state):
+        # Returns (new uids, (meta key, new watermark)), or None when nothing
+        # arrived since the last sync.
+        uidvalidity, uidnext = self._status(conn, folder)
+        state = get_state(self.watermark_key(folder))
+        last_uid = 0
+        if state:
+            saved_validity, saved_uid = (int(v) for v in state.split(":"))
+            # a new UIDVALIDITY means old UIDs are meaningless: rescan
+            if saved_validity == uidvalidity:
+                last_uid = saved_uid
+        if uidnext - 1 <= last_uid:
+            return None
+        uids = self._new_uids(conn, folder, last_uid)
+        # everything below UIDNEXT existed at STATUS time and was searched
+        return uids, (self.watermark_key(folder), f"{uidvalidity}:{max([uidnext - 1, *uids])}")
+
+    def _fetch_headers(self, conn, uids):
+        # yields (uid, referenced message ids, sender address) per reply
+        for start in range(0, len(uids), FETCH_CHUNK):
+            chunk = uids[start:start + FETCH_CHUNK]
+            uid_set = ",".join(str(uid) for uid in chunk)
+            typ, data = conn.uid("FETCH", uid_set, f"(UID BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])")
+            if typ != "OK":
+                raise imaplib.IMAP4.error(f"UID FETCH failed: {data!r}")
+            for item in data:
+                if not isinstance(item, tuple):
+                    continue
+                match = UID_RE.search(item[0])
+                if not match:
+                    continue
+                headers = self._parser.parsebytes(item[1])
+                if _is_automatic(headers):
+                    continue
+                referenced = MSGID_RE.findall(
+                    f"{headers.get('In-Reply-To') or ''} {headers.get('References') or ''}")
+                senders = getaddresses([headers.get("From") or ""])
+                sender = senders[0][1].strip().lower() if senders else ""
+                yield int(match.group(1)), referenced, sender
+
+    def sync(self, get_state, find_leads, record):
+        # get_state(folder) -> "uidvalidity:last_uid" or None
+        # find_leads(message_ids) -> {message_id: lead_id}
+        # record(lead_ids, emails, watermarks) -> number of leads marked
+        # Returns (messages scanned, leads marked).
+        scanned = 0
+        lead_ids = set()
+        emails = set()
+        watermarks = []
+
+        conn = self._connect()
+        try:
+            for folder in self.folders:
+                pending = self._pending(conn, folder, get_state)
+                if pending is None:
+                    continue
+                uids, watermark = pending
+                replies = list(self._fetch_headers(conn, uids)) if uids else []
+                scanned += len(uids)
+
+                matched = find_leads({mid for _, referenced, _ in replies for mid in referenced})
+                for _, referenced, sender in replies:
+                    ids = {matched[mid] for mid in referenced if mid in matched}
+                    if ids:
+                        lead_ids.update(ids)
+                    elif sender:
+                        emails.add(sender)
+                watermarks.append(watermark)
+        finally:
+            try:
+                conn.logout()
+            except Exception:
+                pass
+
+        if not watermarks:
+            return 0, 0
+        return scanned, record(sorted(lead_ids), sorted(emails), watermarks)
@@ -0,0 +1,140 @@
+import heapq
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# =========================
+# Provider-aware send scheduler
+# =========================
+#
+# Keeps up to `workers` sends in flight. Pacing is done per recipient mail
+# provider (jittered gap between two sends to the same provider) plus one
+# global token bucket, so a run takes roughly as long as its busiest provider
+# instead of lead count x average delay.
+
+PROVIDER_ALIASES = {
+    "googlemail.com": "gmail.com",
+    "ymail.com": "yahoo.com",
+    "rocketmail.com": "yahoo.com",
+    "protonmail.com": "proton.me",
+    "pm.me": "proton.me",
+    "hotmail.com": "outlook.com",
+    "live.com": "outlook.com",
+    "msn.com": "outlook.com",
+}
+
+
+def provider_for(email):
+    domain = email.rsplit("@", 1)[-1].strip().lower()
+    return PROVIDER_ALIASES.get(domain, domain)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                sleep_for = (1 - self.tokens) / self.rate
+            time.sleep(sleep_for)
+
+
+class SendScheduler:
+    def __init__(self, workers=4, spacing_min=0, spacing_max=0, global_per_minute=0):
+        self.workers = max(1, workers)
+        self.spacing_min = spacing_min
+        self.spacing_max = max(spacing_min, spacing_max)
+        self.global_bucket = TokenBucket(global_per_minute, burst=self.workers)
+        self.output_lock = threading.Lock()
+        # once set, run() stops handing out new jobs and waits for the ones
+        # already in flight
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+
+    def _spacing(self):
+        if self.spacing_max <= 0:
+            return 0.0
+        return random.uniform(self.spacing_min, self.spacing_max)
+
+    def _run_job(self, job, on_done):
+        email, func = job
+        ok = False
+        try:
+            func()
+            ok = True
+        except Exception as e:
+            with self.output_lock:
+                print(f"\nFailed to send to {email}: {e}. Continuing with next.")
+        finally:
+            on_done(email, ok)
+        return ok
+
+    def log(self, message):
+        with self.output_lock:
+            print(message)
+
+    def run(self, jobs, on_done=None):
+        # jobs: iterable of (recipient_email, callable). Returns (ok, failed).
+        queues = {}
+        for email, func in jobs:
+            queues.setdefault(provider_for(email), deque()).append((email, func))
+
+        # heap of (ready_at, seq, provider); one entry per provider with work left
+        now = time.monotonic()
+        heap = [(now, seq, provider) for seq, provider in enumerate(queues)]
+        heapq.heapify(heap)
+        seq = len(heap)
+
+        slots = threading.BoundedSemaphore(self.workers)
+        counts = {"ok": 0, "failed": 0}
+
+        def done(email, ok):
+            try:
+                with self.output_lock:
+                    counts["ok" if ok else "failed"] += 1
+                    if on_done:
+                        on_done(email, ok)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while heap and not self.stopping.is_set():
+                ready_at, _, provider = heapq.heappop(heap)
+                delay = ready_at - time.monotonic()
+                if delay > 0 and self.stopping.wait(delay):
+                    break
+
+                slots.acquire()
+                self.global_bucket.wait()
+                if self.stopping.is_set():
+                    slots.release()
+                    break
+                job = queues[provider].popleft()
+                pool.submit(self._run_job, job, done)
+
+                if queues[provider]:
+                    heapq.heappush(heap, (time.monotonic() + self._spacing(), seq, provider))
+                    seq += 1
+
+        return counts["ok"], counts["failed"]
@@ -0,0 +1,143 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+# =========================
+# Recipient-local send windows
+# =========================
+#
+# Leads carry an IANA timezone (from the CSV, or guessed from the
+# recipient's country TLD; '' when unknown). Mail is only sent while the
+# recipient's local clock is inside the send window, e.g. 09:00-17:00 on
+# weekdays.
+#
+# Leads in the same zone open and close together, so the scheduler keeps a
+# heap of (next open/close instant, zone) with one entry per zone rather
+# than per lead: each decision is a heap pop/push, and the set of open
+# zones is handed to the lead selection queries as a filter. The heap top
+# is the exact moment something changes, which is how long the daemon
+# sleeps.
+
+# recipient country TLD -> the zone most of its inboxes live in. ccTLDs
+# widely registered as generic names (.co, .io, .ai, .me, .tv, ...) are left
+# out: their owners could be anywhere.
+TLD_TIMEZONES = {
+    "uk": "Europe/London", "ie": "Europe/Dublin", "de": "Europe/Berlin", "at": "Europe/Vienna",
+    "ch": "Europe/Zurich", "fr": "Europe/Paris", "be": "Europe/Brussels", "nl": "Europe/Amsterdam",
+    "es": "Europe/Madrid", "pt": "Europe/Lisbon", "it": "Europe/Rome", "se": "Europe/Stockholm",
+    "no": "Europe/Oslo", "dk": "Europe/Copenhagen", "fi": "Europe/Helsinki", "pl": "Europe/Warsaw",
+    "cz": "Europe/Prague", "gr": "Europe/Athens", "ro": "Europe/Bucharest", "tr": "Europe/Istanbul",
+    "ua": "Europe/Kyiv", "ru": "Europe/Moscow", "il": "Asia/Jerusalem", "ae": "Asia/Dubai",
+    "sa": "Asia/Riyadh", "in": "Asia/Kolkata", "pk": "Asia/Karachi", "bd": "Asia/Dhaka",
+    "sg": "Asia/Singapore", "my": "Asia/Kuala_Lumpur", "id": "Asia/Jakarta", "th": "Asia/Bangkok",
+    "vn": "Asia/Ho_Chi_Minh", "ph": "Asia/Manila", "cn": "Asia/Shanghai", "hk": "Asia/Hong_Kong",
+    "tw": "Asia/Taipei", "jp": "Asia/Tokyo", "kr": "Asia/Seoul", "au": "Australia/Sydney",
+    "nz": "Pacific/Auckland", "za": "Africa/Johannesburg", "ng": "Africa/Lagos", "ke": "Africa/Nairobi",
+    "eg": "Africa/Cairo", "ca": "America/Toronto", "us": "America/New_York", "mx": "America/Mexico_City",
+    "br": "America/Sao_Paulo", "ar": "America/Argentina/Buenos_Aires", "cl": "America/Santiago",
+    "pe": "America/Lima",
+}
+
+
+def valid_timezone(name):
+    # canonical zone name, or '' if it is not a zone tzdata knows
+    name = (name or "").strip()
+    if not name:
+        return ""
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ""
+    return name
+
+
+def infer_timezone(email):
+    # 'x@shop.co.uk' -> 'Europe/London'; generic TLDs give ''
+    tld = (email or "").rsplit("@", 1)[-1].rsplit(".", 1)[-1].strip().lower()
+    return TLD_TIMEZONES.get(tld, "")
+
+
+class SendWindow:
+    def __init__(self, start_hour=9, end_hour=17, weekdays_only=True):
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.weekdays_only = weekdays_only
+
+    @property
+    def always_open(self):
+        return self.start_hour == self.end_hour
+
+    def _allowed_day(self, local):
+        return not self.weekdays_only or local.weekday() < 5
+
+    def is_open(self, zone, now):
+        if self.always_open:
+            return True
+        local = now.astimezone(ZoneInfo(zone))
+        return self._allowed_day(local) and self.start_hour <= local.hour < self.end_hour
+
+    def next_change(self, zone, now):
+        # UTC instant at which the window next opens (if closed now) or
+        # closes (if open now)
+        tz = ZoneInfo(zone)
+        local = now.astimezone(tz)
+        open_now = self._allowed_day(local) and self.start_hour <= local.hour < self.end_hour
+        hour = self.end_hour if open_now else self.start_hour
+        for days in range(8):
+            day = local.date() + timedelta(days=days)
+            candidate = datetime(day.year, day.month, day.day, hour, tzinfo=tz)
+            if candidate > local and (open_now or self._allowed_day(candidate)):
+                return candidate.astimezone(timezone.utc)
+        return now + timedelta(days=1)
+
+
+class WindowScheduler:
+    # default_zone stands in for leads with no known timezone; without one
+    # those leads are never held back.
+    def __init__(self, window, default_zone=""):
+        self.window = window
+        self.default_zone = default_zone
+        self._heap = []          # (next change, zone)
+        self._known = set()
+        self._open = set()
+
+    def _zone_for(self, zone):
+        return zone or self.default_zone
+
+    def add_zones(self, zones, now=None):
+        now = now or datetime.now(timezone.utc)
+        for zone in zones:
+            if zone in self._known:
+                continue
+            self._known.add(zone)
+            effective = self._zone_for(zone)
+            if not effective or self.window.always_open:
+                self._open.add(zone)
+                continue
+            if self.window.is_open(effective, now):
+                self._open.add(zone)
+            heapq.heappush(self._heap, (self.window.next_change(effective, now), zone))
+
+    def _advance(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            _, zone = heapq.heappop(self._heap)
+            effective = self._zone_for(zone)
+            if self.window.is_open(effective, now):
+                self._open.add(zone)
+            else:
+                self._open.discard(zone)
+            heapq.heappush(self._heap, (self.window.next_change(effective, now), zone))
+
+    def open_zones(self, now=None):
+        self._advance(now or datetime.now(timezone.utc))
+        return sorted(self._open)
+
+    def seconds_until_next_open(self, now=None):
+        # how long until a zone that is closed now opens; None if none will
+        now = now or datetime.now(timezone.utc)
+        self._advance(now)
+        closed = [when for when, zone in self._heap if zone not in self._open]
+        if not closed:
+            return None
+        return max(0.0, (min(closed) - now).total_seconds())
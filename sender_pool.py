@@ -0,0 +1,167 @@
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+
+from message_builder import MessageBuilder
+from smtp_pool import SMTPPool
+
+
+# =========================
+# Sender account pool
+# =========================
+#
+# Several sending mailboxes, each with its own SMTP server, credentials,
+# From name and daily/hourly quota. Usage is counted per account per hour
+# (the sends table in the DB seeds it at run start), the daily quota is a
+# rolling 24 hours. A message takes a slot when it is planned; a lead that
+# was already written to from one account stays on it.
+
+def hour_key(when=None):
+    return (when or datetime.utcnow()).strftime("%Y-%m-%dT%H")
+
+
+class SenderAccount:
+    def __init__(self, name, host, port, username, password, from_email=None, from_name="",
+                 daily_quota=0, hourly_quota=0, use_tls=True, pool_size=4,
+                 max_messages_per_conn=50, noop_after_seconds=30):
+        self.name = name
+        self.from_email = from_email or username
+        self.from_name = from_name
+        self.daily_quota = daily_quota      # 0 means unlimited
+        self.hourly_quota = hourly_quota
+        self.pool = SMTPPool(
+            host, port, username, password,
+            size=pool_size,
+            max_messages_per_conn=max_messages_per_conn,
+            noop_after_seconds=noop_after_seconds,
+            use_tls=use_tls,
+        )
+        self.builder = MessageBuilder(from_name, self.from_email)
+        self.usage = {}  # hour key -> messages
+
+    def used(self, now=None):
+        # (last 24 hours, current hour)
+        now = now or datetime.utcnow()
+        current = hour_key(now)
+        since = hour_key(now - timedelta(hours=23))
+        daily = sum(n for hour, n in self.usage.items() if hour >= since)
+        return daily, self.usage.get(current, 0)
+
+    def has_room(self, now=None):
+        daily, hourly = self.used(now)
+        return ((not self.daily_quota or daily < self.daily_quota)
+                and (not self.hourly_quota or hourly < self.hourly_quota))
+
+    def load(self, now=None):
+        # share of the tighter quota already used; unlimited accounts
+        # compare by raw count
+        daily, hourly = self.used(now)
+        shares = []
+        if self.daily_quota:
+            shares.append(daily / self.daily_quota)
+        if self.hourly_quota:
+            shares.append(hourly / self.hourly_quota)
+        return (max(shares) if shares else 0.0, daily)
+
+
+class Reservation:
+    # one send slot taken by SenderPool.acquire(), counted against `hour`
+    __slots__ = ("account", "hour")
+
+    def __init__(self, account, hour):
+        self.account = account
+        self.hour = hour
+
+
+class SenderPool:
+    def __init__(self, accounts):
+        if not accounts:
+            raise ValueError("At least one sender account is required")
+        self.accounts = {account.name: account for account in accounts}
+        self.default = accounts[0]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, **defaults):
+        # {"accounts": [{"name", "host", "port", "username", "password" or
+        #  "password_env", "from_email", "from_name", "daily_quota",
+        #  "hourly_quota", "use_tls"}]}
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        accounts = []
+        for entry in config.get("accounts", []):
+            entry = dict(entry)
+            password_env = entry.pop("password_env", None)
+            if password_env:
+                entry["password"] = os.getenv(password_env)
+            accounts.append(SenderAccount(**{**defaults, **entry}))
+        return cls(accounts)
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def load_usage(self, rows):
+        # rows: (account, hour key, messages sent) from the sends table;
+        # replaces whatever was counted in memory
+        with self._lock:
+            for account in self.accounts.values():
+                account.usage = {}
+            for name, hour, sent in rows:
+                account = self.accounts.get(name)
+                if account:
+                    account.usage[hour] = account.usage.get(hour, 0) + sent
+
+    def get(self, name):
+        return self.accounts.get(name, self.default)
+
+    def _pick(self, preferred, now):
+        if preferred in self.accounts:
+            candidates = [self.accounts[preferred]]
+        else:
+            candidates = list(self.accounts.values())
+        candidates = [account for account in candidates if account.has_room(now)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda a: a.load(now))
+
+    def choose(self, preferred=None):
+        # the account acquire() would pick right now, without taking a slot
+        with self._lock:
+            return self._pick(preferred, datetime.utcnow())
+
+    def acquire(self, preferred=None):
+        # Takes one send slot. A known preferred account is used or nothing
+        # (a lead never switches mailbox); otherwise the least-loaded account
+        # with room. Returns a Reservation, or None when no slot is available.
+        now = datetime.utcnow()
+        with self._lock:
+            account = self._pick(preferred, now)
+            if account is None:
+                return None
+            key = hour_key(now)
+            account.usage[key] = account.usage.get(key, 0) + 1
+            return Reservation(account, key)
+
+    def release(self, reservation):
+        # give back a slot for a message that was not sent, in the hour it
+        # was taken even if that hour has since ended
+        usage = reservation.account.usage
+        with self._lock:
+            if usage.get(reservation.hour):
+                usage[reservation.hour] -= 1
+
+    def exhausted(self):
+        now = datetime.utcnow()
+        with self._lock:
+            return not any(account.has_room(now) for account in self.accounts.values())
+
+    def close(self):
+        for account in self.accounts.values():
+            account.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
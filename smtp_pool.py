@@ -0,0 +1,186 @@
+import smtplib
+import socket
+import threading
+import time
+
+from metrics import metrics
+
+
+# =========================
+# Pooled SMTP sessions
+# =========================
+#
+# Keeps authenticated SMTP connections alive for a whole run so each message
+# only pays for MAIL/RCPT/DATA instead of TCP + STARTTLS + AUTH.
+
+RECONNECT_CODES = (421,)
+
+
+def refused_codes(error):
+    # SMTP reply codes from an SMTPRecipientsRefused, one per recipient
+    return [code for code, _ in error.recipients.values()]
+
+
+def is_permanent_failure(error):
+    # 5xx replies are final; 4xx (greylisting, "try again later") and
+    # connection trouble are worth another attempt
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = refused_codes(error)
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class PooledConnection:
+    def __init__(self, server):
+        self.server = server
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    def __init__(self, host, port, username, password, size=1,
+                 max_messages_per_conn=50, noop_after_seconds=30, timeout=30,
+                 use_tls=True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = max(1, size)
+        self.max_messages_per_conn = max_messages_per_conn
+        self.noop_after_seconds = noop_after_seconds
+        self.timeout = timeout
+        self.use_tls = use_tls
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+        # simple counters, handy when tuning the pool
+        self.connects = 0
+        self.reconnects = 0
+
+    # --- connection lifecycle ---
+
+    def _connect(self):
+        with metrics.timer("smtp_connect"):
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                server.ehlo()
+            except Exception:
+                self._quit(server)
+                raise
+        try:
+            if self.use_tls:
+                with metrics.timer("smtp_tls"):
+                    server.starttls()
+                    server.ehlo()
+            if self.username:
+                with metrics.timer("smtp_login"):
+                    server.login(self.username, self.password)
+        except Exception:
+            self._quit(server)
+            raise
+        self.connects += 1
+        return PooledConnection(server)
+
+    @staticmethod
+    def _quit(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_healthy(self, conn):
+        if time.monotonic() - conn.last_used < self.noop_after_seconds:
+            return True
+        try:
+            code, _ = conn.server.noop()
+            return code == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    return self._connect()
+                if self._is_healthy(conn):
+                    return conn
+                self._quit(conn.server)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, conn, broken=False):
+        try:
+            rotate = (self.max_messages_per_conn
+                      and conn.messages_sent >= self.max_messages_per_conn)
+            if broken or rotate:
+                self._quit(conn.server)
+            else:
+                conn.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    # --- public API ---
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        # One transparent retry on a fresh connection when the server dropped
+        # us (421 / closed socket); anything else is the caller's problem.
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                with metrics.timer("smtp_data"):
+                    result = conn.server.sendmail(from_addr, to_addrs, msg)
+            except (smtplib.SMTPServerDisconnected, socket.timeout, ConnectionError):
+                self._release(conn, broken=True)
+                if attempt:
+                    raise
+                self.reconnects += 1
+                metrics.inc("retried")
+                continue
+            except smtplib.SMTPResponseException as e:
+                reconnect = e.smtp_code in RECONNECT_CODES
+                self._release(conn, broken=reconnect)
+                if attempt or not reconnect:
+                    raise
+                self.reconnects += 1
+                metrics.inc("retried")
+                continue
+            except smtplib.SMTPRecipientsRefused as e:
+                # smtplib RSETs the session after a refusal, except on a 421,
+                # where it has already closed the socket
+                reconnect = any(code in RECONNECT_CODES for code in refused_codes(e))
+                self._release(conn, broken=reconnect)
+                if attempt or not reconnect:
+                    raise
+                self.reconnects += 1
+                metrics.inc("retried")
+                continue
+            except Exception:
+                self._release(conn, broken=True)
+                raise
+            conn.messages_sent += 1
+            self._release(conn)
+            return result
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._quit(conn.server)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
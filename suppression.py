@@ -0,0 +1,34 @@
+# =========================
+# In-memory suppression list
+# =========================
+#
+# Loaded once per run from the suppression table into two hash sets, so
+# checking a recipient costs one or two set lookups and no database access.
+
+class SuppressionList:
+    def __init__(self, addresses=(), domains=()):
+        self.addresses = frozenset(a.strip().lower() for a in addresses)
+        self.domains = frozenset(d.strip().lower() for d in domains)
+
+    @classmethod
+    def from_rows(cls, rows):
+        # rows: (value, kind) with kind 'address' or 'domain'
+        addresses, domains = [], []
+        for value, kind in rows:
+            (domains if kind == "domain" else addresses).append(value)
+        return cls(addresses, domains)
+
+    def __len__(self):
+        return len(self.addresses) + len(self.domains)
+
+    def reason(self, email):
+        # Returns "address" or "domain" when the recipient is suppressed.
+        email = email.strip().lower()
+        if email in self.addresses:
+            return "address"
+        if self.domains and email.rsplit("@", 1)[-1] in self.domains:
+            return "domain"
+        return None
+
+    def is_suppressed(self, email):
+        return self.reason(email) is not None
@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+import time
+
+
+# =========================
+# Template registry
+# =========================
+#
+# Email bodies live in templates/ as plain HTML with {{placeholder}} slots:
+#
+#   <vertical>_<n>.html   initial-email variants, rotated by template_index
+#   followup.html         follow-up body
+#   _<name>.html          partial, rendered once and available as {{name}}
+#
+# Each file is compiled once into a list of literal segments plus the
+# positions of its per-message slots. Values that never change during a run
+# (FROM_NAME, social links, partials) are folded into the literal segments at
+# compile time, so rendering is a list copy and a join. Files are reloaded
+# only when something in the directory changes on disk.
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+VARIANT_RE = re.compile(r"^(?P<vertical>[a-z0-9]+)_(?P<number>\d+)$")
+
+
+class CompiledTemplate:
+    __slots__ = ("name", "parts", "slots")
+
+    def __init__(self, name, source, static):
+        self.name = name
+        parts = []
+        slots = []
+        literal = []
+        pieces = PLACEHOLDER_RE.split(source)
+        # split() alternates literal text and placeholder names
+        for i, piece in enumerate(pieces):
+            if i % 2 == 0:
+                literal.append(piece)
+            elif piece in static:
+                literal.append(static[piece])
+            else:
+                parts.append("".join(literal))
+                literal = []
+                slots.append((len(parts), piece))
+                parts.append(None)
+        parts.append("".join(literal))
+        self.parts = parts
+        self.slots = slots
+
+    def render(self, **values):
+        parts = self.parts[:]
+        for pos, name in self.slots:
+            parts[pos] = values[name]
+        return "".join(parts)
+
+
+class TemplateRegistry:
+    def __init__(self, directory, static=None, check_interval=2.0):
+        self.directory = directory
+        self.static = dict(static or {})
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._fingerprint = None
+        self._templates = {}
+        self._variants = {}
+
+    # --- loading ---
+
+    def _scan(self):
+        files = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".html"):
+                files[entry.name[:-5]] = (entry.path, entry.stat().st_mtime_ns)
+        return files
+
+    def _load(self, files):
+        static = dict(self.static)
+        for name, (path, _) in sorted(files.items()):
+            if name.startswith("_"):
+                with open(path, encoding="utf-8") as f:
+                    partial = CompiledTemplate(name, f.read().strip(), self.static)
+                static[name[1:]] = partial.render()
+
+        templates = {}
+        variants = {}
+        for name, (path, _) in files.items():
+            if name.startswith("_"):
+                continue
+            with open(path, encoding="utf-8") as f:
+                templates[name] = CompiledTemplate(name, f.read(), static)
+            m = VARIANT_RE.match(name)
+            if m:
+                variants.setdefault(m.group("vertical"), []).append((int(m.group("number")), name))
+
+        self._templates = templates
+        self._variants = {
+            vertical: [templates[name] for _, name in sorted(entries)]
+            for vertical, entries in variants.items()
+        }
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval and self._fingerprint is not None:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_interval and self._fingerprint is not None:
+                return
+            files = self._scan()
+            fingerprint = tuple(sorted((name, mtime) for name, (_, mtime) in files.items()))
+            if fingerprint != self._fingerprint:
+                self._load(files)
+                self._fingerprint = fingerprint
+            self._checked_at = now
+
+    # --- lookup ---
+
+    def get(self, name):
+        self._refresh()
+        return self._templates[name]
+
+    def variants(self, vertical):
+        self._refresh()
+        return self._variants.get(vertical, [])
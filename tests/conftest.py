@@ -0,0 +1,92 @@
+import os
+import sys
+import socketserver
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    # a freshly migrated database in tmp_path, used through the shared
+    # connection like the real one
+    db.close_connection()
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "emails.db"))
+    db.init_db()
+    yield db
+    db.close_connection()
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    # Plain-text SMTP on localhost. RCPT is answered from rcpt_replies in
+    # order (then "250 OK"); a 421 reply also closes the connection, as a
+    # real server would.
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeSMTPHandler)
+        self.port = self.server_address[1]
+        self.rcpt_replies = []
+        self.connections = 0
+        self.delivered = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def next_rcpt_reply(self):
+        with self._lock:
+            return self.rcpt_replies.pop(0) if self.rcpt_replies else "250 OK"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 fake ESMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("latin-1").strip().split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 fake")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                answer = self.server.next_rcpt_reply()
+                self.reply(answer)
+                if answer.startswith("421"):
+                    return
+                if answer.startswith("250"):
+                    recipients.append(line.decode("latin-1").strip())
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.delivered.extend(recipients)
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:  # RSET, NOOP
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_server():
+    server = FakeSMTPServer()
+    yield server
+    server.stop()
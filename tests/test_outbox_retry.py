@@ -0,0 +1,38 @@
+import smtplib
+
+import pytest
+
+from smtp_pool import SMTPPool, is_permanent_failure
+
+
+def _queue_and_send(temp_db, server, email):
+    # one outbox row through claim -> send -> release, as _send_outbox does
+    temp_db.insert_leads([(email, "example.com", "", "local", 0, "tid1", "")])
+    temp_db.queue_outbox([{"lead_id": 1, "kind": "initial", "sequence": 0, "to_email": email,
+                           "subject": "hi", "body_html": "<p>hi</p>", "message_id": "<m1@x>"}])
+    outbox_id = temp_db.fetch_all("SELECT id FROM outbox")[0][0]
+    assert temp_db.claim_outbox(outbox_id, "test")
+    with SMTPPool("127.0.0.1", server.port, "", "", use_tls=False, timeout=5) as pool:
+        with pytest.raises(smtplib.SMTPRecipientsRefused) as refused:
+            pool.sendmail("me@sender.example", [email], b"Subject: hi\r\n\r\nhi\r\n")
+    permanent = is_permanent_failure(refused.value)
+    temp_db.release_outbox(outbox_id, refused.value, retry=not permanent)
+    return permanent, temp_db.fetch_all("SELECT state, attempts FROM outbox")[0]
+
+
+@pytest.mark.parametrize("reply", ["450 4.2.0 Greylisted", "451 4.7.1 Try again later",
+                                   "452 4.2.2 Mailbox full"])
+def test_temporary_refusal_is_requeued(temp_db, smtp_server, reply):
+    smtp_server.rcpt_replies = [reply]
+    assert _queue_and_send(temp_db, smtp_server, "a@example.com") == (False, ("queued", 1))
+
+
+def test_421_refusal_is_requeued(temp_db, smtp_server):
+    # refused again on the pool's fresh connection
+    smtp_server.rcpt_replies = ["421 4.7.0 Try again later"] * 2
+    assert _queue_and_send(temp_db, smtp_server, "a@example.com") == (False, ("queued", 1))
+
+
+def test_permanent_refusal_fails_the_row(temp_db, smtp_server):
+    smtp_server.rcpt_replies = ["550 5.1.1 No such user"]
+    assert _queue_and_send(temp_db, smtp_server, "a@example.com") == (True, ("failed", 1))
@@ -0,0 +1,20 @@
+def test_hot_queries_use_their_indexes(temp_db):
+    failures = [(name, index, plan) for name, index, uses_index, plan in temp_db.check_query_plans()
+                if not uses_index]
+    assert failures == []
+
+
+def test_pending_timezones(temp_db):
+    zones = ["", "Asia/Tokyo", "Europe/London", "Asia/Tokyo", "America/Lima",
+             "Europe/Berlin", "Africa/Lagos"]
+    temp_db.insert_leads([
+        (f"lead{i}@example.com", "example.com", "", "local", 0, f"tid{i}", zone)
+        for i, zone in enumerate(zones, start=1)
+    ])
+    # leads 3 and 6 wait for a follow-up; 5 replied and 7 bounced, which
+    # clears next_action_at like the real updates do
+    temp_db.execute("UPDATE leads SET status = 'initial_sent', next_action_at = '2030-01-01' WHERE id = 3")
+    temp_db.execute("UPDATE leads SET status = 'followup', next_action_at = '2030-01-05' WHERE id = 6")
+    temp_db.execute("UPDATE leads SET status = 'replied', replied = 1 WHERE id = 5")
+    temp_db.execute("UPDATE leads SET status = 'bounced' WHERE id = 7")
+    assert temp_db.get_pending_timezones() == ["", "Asia/Tokyo", "Europe/Berlin", "Europe/London"]
@@ -0,0 +1,116 @@
+import re
+
+from reply_sync import ImapReplySync
+
+
+class FakeImap:
+    # Just enough of imaplib.IMAP4 for ImapReplySync, over one folder held
+    # in memory: {uid: raw header bytes}.
+
+    def __init__(self, uidvalidity=1):
+        self.uidvalidity = uidvalidity
+        self.messages = {}
+        self.fetched = []
+
+    def add(self, uid, headers):
+        self.messages[uid] = "".join(f"{name}: {value}\r\n" for name, value in headers.items()).encode()
+
+    def login(self, username, password):
+        return "OK", [b"logged in"]
+
+    def logout(self):
+        return "BYE", [b""]
+
+    def status(self, folder, items):
+        uidnext = max(self.messages, default=0) + 1
+        return "OK", [f"{folder} (UIDNEXT {uidnext} UIDVALIDITY {self.uidvalidity})".encode()]
+
+    def select(self, folder, readonly=False):
+        return "OK", [str(len(self.messages)).encode()]
+
+    def uid(self, command, *args):
+        if command == "SEARCH":
+            low = int(re.match(r"UID (\d+):\*", args[1]).group(1))
+            uids = sorted(uid for uid in self.messages if uid >= low)
+            # like a real server, "n:*" always includes the newest message
+            if not uids and self.messages:
+                uids = [max(self.messages)]
+            return "OK", [" ".join(str(uid) for uid in uids).encode()]
+        if command == "FETCH":
+            uids = [int(uid) for uid in args[0].split(",")]
+            self.fetched.append(uids)
+            data = []
+            for seq, uid in enumerate(uids, start=1):
+                raw = self.messages[uid]
+                data.append((f"{seq} (UID {uid} BODY[HEADER] {{{len(raw)}}}".encode(), raw))
+                data.append(b")")
+            return "OK", data
+        raise AssertionError(f"unexpected UID {command}")
+
+
+def _add_lead(temp_db, lead_id, email, message_id):
+    temp_db.insert_leads([(email, "example.com", "", "local", 0, f"tid{lead_id}", "")])
+    temp_db.execute("UPDATE leads SET status = 'sent', last_message_id = ? WHERE id = ?",
+                    (message_id, lead_id))
+
+
+def _sync(temp_db, imap):
+    syncer = ImapReplySync("imap.invalid", 993, "me@sender.example", "secret", connect=lambda: imap)
+    return syncer.sync(temp_db.get_meta, temp_db.find_leads_by_message_ids, temp_db.record_replies)
+
+
+def _replied(temp_db):
+    return [row[0] for row in temp_db.fetch_all("SELECT id FROM leads WHERE replied = 1 ORDER BY id")]
+
+
+def test_matches_by_message_id_then_sender(temp_db):
+    _add_lead(temp_db, 1, "alice@example.com", "<m1@sender.example>")
+    _add_lead(temp_db, 2, "bob@example.com", "<m2@sender.example>")
+    _add_lead(temp_db, 3, "carol@example.com", "<m3@sender.example>")
+    imap = FakeImap()
+    # answered from another address, but threaded on our message
+    imap.add(1, {"From": "Alice Assistant <assistant@example.com>",
+                 "In-Reply-To": "<m1@sender.example>"})
+    # no threading headers: matched by sender
+    imap.add(2, {"From": "Bob <BOB@example.com>", "Subject": "hi"})
+    # delivery reports and auto-replies are not replies
+    imap.add(3, {"From": "MAILER-DAEMON@mx.example", "In-Reply-To": "<m3@sender.example>"})
+    imap.add(4, {"From": "carol@example.com", "Auto-Submitted": "auto-replied"})
+
+    assert _sync(temp_db, imap) == (4, 2)
+    assert _replied(temp_db) == [1, 2]
+
+
+def test_uid_watermark_fetches_only_new_mail(temp_db):
+    _add_lead(temp_db, 1, "alice@example.com", "<m1@sender.example>")
+    _add_lead(temp_db, 2, "bob@example.com", "<m2@sender.example>")
+    imap = FakeImap(uidvalidity=7)
+    imap.add(1, {"From": "someone@example.net"})
+    imap.add(2, {"From": "other@example.net"})
+
+    assert _sync(temp_db, imap) == (2, 0)
+    assert imap.fetched == [[1, 2]]
+    assert temp_db.get_meta("imap_uid:INBOX") == "7:2"
+
+    # nothing new: no fetch at all
+    assert _sync(temp_db, imap) == (0, 0)
+    assert imap.fetched == [[1, 2]]
+
+    imap.add(3, {"From": "x@example.net", "References": "<old@elsewhere> <m2@sender.example>"})
+    assert _sync(temp_db, imap) == (1, 1)
+    assert imap.fetched == [[1, 2], [3]]
+    assert _replied(temp_db) == [2]
+    assert temp_db.get_meta("imap_uid:INBOX") == "7:3"
+
+
+def test_new_uidvalidity_rescans_the_folder(temp_db):
+    _add_lead(temp_db, 1, "alice@example.com", "<m1@sender.example>")
+    imap = FakeImap(uidvalidity=1)
+    imap.add(1, {"From": "someone@example.net"})
+    _sync(temp_db, imap)
+
+    imap.uidvalidity = 2
+    imap.add(2, {"From": "alice@example.com"})
+    assert _sync(temp_db, imap) == (2, 1)
+    assert imap.fetched[-1] == [1, 2]
+    assert temp_db.get_meta("imap_uid:INBOX") == "2:2"
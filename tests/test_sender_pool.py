@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import sender_pool
+from sender_pool import SenderAccount, SenderPool
+
+
+class FrozenClock:
+    # stands in for sender_pool.datetime; utcnow() returns `now`
+    def __init__(self, now):
+        self.now = now
+
+    def utcnow(self):
+        return self.now
+
+
+def test_release_after_the_hour_turns_frees_the_acquire_hour(monkeypatch):
+    clock = FrozenClock(datetime(2026, 3, 1, 9, 59, 50))
+    monkeypatch.setattr(sender_pool, "datetime", clock)
+    account = SenderAccount("a", "smtp.invalid", 587, "a@example.com", "secret", hourly_quota=1)
+    pool = SenderPool([account])
+
+    slot = pool.acquire()
+    assert slot.account is account
+    assert pool.acquire() is None
+
+    clock.now = datetime(2026, 3, 1, 10, 0, 5)
+    other = pool.acquire()
+    assert other is not None
+    pool.release(slot)
+
+    # the 09:00 slot was given back; 10:00 still holds the new one
+    assert account.usage == {"2026-03-01T09": 0, "2026-03-01T10": 1}
+    assert pool.acquire() is None
@@ -0,0 +1,30 @@
+import smtplib
+
+import pytest
+
+from smtp_pool import SMTPPool
+
+
+def _pool(server):
+    return SMTPPool("127.0.0.1", server.port, "", "", use_tls=False, timeout=5)
+
+
+def test_temporary_refusal_keeps_the_session(smtp_server):
+    smtp_server.rcpt_replies = ["450 4.2.0 Greylisted"]
+    with _pool(smtp_server) as pool:
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            pool.sendmail("me@sender.example", ["a@example.com"], b"Subject: hi\r\n\r\nhi\r\n")
+        pool.sendmail("me@sender.example", ["a@example.com"], b"Subject: hi\r\n\r\nhi\r\n")
+    assert smtp_server.connections == 1
+    assert len(smtp_server.delivered) == 1
+
+
+def test_421_at_rcpt_reconnects(smtp_server):
+    smtp_server.rcpt_replies = ["421 4.7.0 Try again later"]
+    with _pool(smtp_server) as pool:
+        pool.sendmail("me@sender.example", ["a@example.com"], b"Subject: hi\r\n\r\nhi\r\n")
+        pool.sendmail("me@sender.example", ["b@example.com"], b"Subject: hi\r\n\r\nhi\r\n")
+        assert pool.reconnects == 1
+    # the closed session was not handed out again
+    assert smtp_server.connections == 2
+    assert len(smtp_server.delivered) == 2
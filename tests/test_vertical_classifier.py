@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from vertical_classifier import VerticalClassifier
+
+VERTICALS_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "verticals.json")
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return VerticalClassifier.from_file(VERTICALS_JSON)
+
+
+@pytest.mark.parametrize("domain", [
+    "chair.com", "repair.com", "airline.com", "aircon.com", "thai.com", "aiden.com",
+    "botanical.com", "bottle.com", "bedrock.com", "bestthai.com",
+])
+def test_short_keywords_inside_ordinary_words(classifier, domain):
+    assert classifier.classify(domain) == "local"
+
+
+@pytest.mark.parametrize("domain", [
+    "smartbed.com", "bedstore.com", "bedding.com", "mybed.com", "bedroom.com", "bedorder.com",
+    "airbed.com", "BedOrder.com",
+])
+def test_lowercase_sleep_domains(classifier, domain):
+    assert classifier.classify(domain) == "sleep"
+
+
+@pytest.mark.parametrize("domain", [
+    "openai.com", "getai.com", "smartai.com", "aitools.com", "chatbot.com", "chatbots.com",
+    "SmartAI.com", "aicloud.io", "aidata.com",
+])
+def test_lowercase_ai_domains(classifier, domain):
+    assert classifier.classify(domain) == "ai"
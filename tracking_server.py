@@ -0,0 +1,368 @@
+import os
+import sys
+import json
+import time
+import hmac
+import base64
+import signal
+import asyncio
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from dotenv import load_dotenv # type: ignore
+
+load_dotenv()
+
+# db reads DB_PATH and its tunables from the environment
+from db import init_db, record_opens, parse_tid, tracking_signer, legacy_tids, parse_open_timestamp
+
+
+# =========================
+# Config
+# =========================
+#
+# Stand-alone asyncio open tracker. Requests are answered straight away; the
+# opens go into a bounded in-memory queue and a single background writer
+# appends them to open_events in batches (see db.record_opens), which also
+# folds them into the leads table. POST /opens accepts a batch of tids, e.g.
+# from another tracker or a log export; as the tracker listens publicly, it
+# is only enabled when TRACKER_INGEST_TOKEN is set. Every tid is checked
+# against its HMAC signature in memory first; forged or malformed ones are
+# counted and dropped without touching the queue or the database.
+
+TRACKER_HOST = os.getenv("TRACKER_HOST", "0.0.0.0")
+TRACKER_PORT = int(os.getenv("TRACKER_PORT", 5001))
+TRACKER_QUEUE_SIZE = int(os.getenv("TRACKER_QUEUE_SIZE", 100000))
+TRACKER_BATCH_SIZE = int(os.getenv("TRACKER_BATCH_SIZE", 1000))
+TRACKER_FLUSH_MS = int(os.getenv("TRACKER_FLUSH_MS", 250))
+TRACKER_STATS_SECONDS = int(os.getenv("TRACKER_STATS_SECONDS", 10))
+# POST /opens requires "Authorization: Bearer <token>"; unset disables it
+TRACKER_INGEST_TOKEN = os.getenv("TRACKER_INGEST_TOKEN", "")
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8/x8AAwMB/6X6ZQAAAABJRU5ErkJggg=="
+)
+
+
+# =========================
+# HTTP plumbing
+# =========================
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+           404: "Not Found", 405: "Method Not Allowed"}
+
+
+def http_response(status, body, content_type, keep_alive):
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Cache-Control: no-store, no-cache, must-revalidate\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    return head.encode("ascii") + body
+
+
+async def read_request(reader):
+    # Returns (method, target, headers, body) or None once the client is gone.
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        return None
+    if length < 0 or length > MAX_BODY_BYTES:
+        return None
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+# =========================
+# Tracker
+# =========================
+
+class OpenTracker:
+    def __init__(self, queue_size=TRACKER_QUEUE_SIZE, batch_size=TRACKER_BATCH_SIZE,
+                 flush_ms=TRACKER_FLUSH_MS):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.started = time.monotonic()
+        self.hits = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self._last_hits = 0
+        self._last_report = time.monotonic()
+
+    # --- request side ---
+
+    def accept(self, tid):
+        if parse_tid(tid) is None:
+            self.rejected += 1
+            return False
+        return True
+
+    def enqueue(self, tid, opened_at=None):
+        self.hits += 1
+        try:
+            self.queue.put_nowait((tid, opened_at or datetime.utcnow().isoformat()))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    def ingest(self, headers, body):
+        if not TRACKER_INGEST_TOKEN:
+            return 403, b"ingest disabled: set TRACKER_INGEST_TOKEN", "text/plain"
+        if not hmac.compare_digest(headers.get("authorization", ""), f"Bearer {TRACKER_INGEST_TOKEN}"):
+            return 401, b"unauthorized", "text/plain"
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            return 400, b"invalid json", "text/plain"
+        items = payload.get("tids") if isinstance(payload, dict) else payload
+        if not isinstance(items, list):
+            return 400, b'expected a list of tids or {"tids": [...]}', "text/plain"
+
+        accepted = dropped = rejected = 0
+        for item in items:
+            if isinstance(item, dict):
+                tid, opened_at = item.get("tid"), item.get("opened_at")
+            else:
+                tid, opened_at = item, None
+            if not isinstance(tid, str) or not tid:
+                continue
+            if opened_at is not None:
+                # a bad timestamp would outrank every real one in last_opened_at
+                opened_at = parse_open_timestamp(opened_at)
+                if opened_at is None:
+                    self.rejected += 1
+                    rejected += 1
+                    continue
+            if not self.accept(tid):
+                rejected += 1
+            elif self.enqueue(tid, opened_at):
+                accepted += 1
+            else:
+                dropped += 1
+        result = {"accepted": accepted, "dropped": dropped, "rejected": rejected}
+        return 200, json.dumps(result).encode(), "application/json"
+
+    def route(self, method, target, headers, body):
+        parts = urlsplit(target)
+        path = parts.path
+        if path in ("/pixel", "/api/pixel", "/update_open"):
+            if method not in ("GET", "HEAD"):
+                return 405, b"method not allowed", "text/plain"
+            tid = (parse_qs(parts.query).get("tid") or [""])[0]
+            if path == "/update_open":
+                # compatibility with the old Flask endpoint that api/pixel.js calls
+                if not tid:
+                    return 400, b"no tid", "text/plain"
+                if not self.accept(tid):
+                    return 400, b"invalid tid", "text/plain"
+                self.enqueue(tid)
+                return 200, b"ok", "text/plain"
+            # the image is served whatever the tid, so a bad one is never visible
+            if tid and self.accept(tid):
+                self.enqueue(tid)
+            return 200, PIXEL_PNG, "image/png"
+        if path == "/opens":
+            if method != "POST":
+                return 405, b"method not allowed", "text/plain"
+            return self.ingest(headers, body)
+        if path == "/stats":
+            return 200, json.dumps(self.stats()).encode(), "application/json"
+        return 404, b"not found", "text/plain"
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload, content_type = self.route(method, target, headers, body)
+                if method == "HEAD":
+                    payload = b""
+                writer.write(http_response(status, payload, content_type, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # --- writer side ---
+
+    async def _next_batch(self):
+        events = [await self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(events) < self.batch_size:
+            try:
+                events.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                events.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return events
+
+    async def _write(self, events):
+        # SQLite is blocking; keep it off the event loop
+        self.written += await asyncio.to_thread(record_opens, events)
+        self.batches += 1
+
+    async def writer_loop(self):
+        while True:
+            await self._write(await self._next_batch())
+
+    async def drain(self):
+        while not self.queue.empty():
+            events = []
+            while not self.queue.empty() and len(events) < self.batch_size:
+                events.append(self.queue.get_nowait())
+            await self._write(events)
+
+    # --- reporting ---
+
+    def stats(self):
+        return {
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "hits": self.hits,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "queue_depth": self.queue.qsize(),
+            "leads_updated": self.written,
+            "batches": self.batches,
+        }
+
+    async def report_loop(self, every):
+        while True:
+            await asyncio.sleep(every)
+            if self.hits == self._last_hits and self.queue.empty():
+                continue
+            now = time.monotonic()
+            rate = (self.hits - self._last_hits) / (now - self._last_report)
+            self._last_hits, self._last_report = self.hits, now
+            s = self.stats()
+            print(f"[tracker] {rate:.0f} hits/s, queue {s['queue_depth']}, "
+                  f"{s['leads_updated']} leads updated in {s['batches']} batches, {s['dropped']} dropped, "
+                  f"{s['rejected']} rejected")
+
+
+async def serve(host=TRACKER_HOST, port=TRACKER_PORT):
+    init_db()
+    # load the key and the legacy tracking_ids before the first hit
+    tracking_signer()
+    legacy_tids()
+    tracker = OpenTracker()
+    server = await asyncio.start_server(tracker.handle, host, port, limit=MAX_HEADER_BYTES,
+                                        backlog=1024)
+    background = [asyncio.create_task(tracker.writer_loop())]
+    if TRACKER_STATS_SECONDS > 0:
+        background.append(asyncio.create_task(tracker.report_loop(TRACKER_STATS_SECONDS)))
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    print(f"Open tracker listening on {host}:{port}")
+    if not TRACKER_INGEST_TOKEN:
+        print("POST /opens is disabled; set TRACKER_INGEST_TOKEN to enable batch ingest.")
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        for task in background:
+            task.cancel()
+        await tracker.drain()
+        print(f"[tracker] stopped: {tracker.stats()}")
+
+
+# =========================
+# Load generator
+# =========================
+
+async def _load_worker(host, port, tids, counter):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for tid in tids:
+            writer.write(f"GET /pixel?tid={tid} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            await read_response(reader)
+            counter[0] += 1
+    finally:
+        writer.close()
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    return await reader.readexactly(length)
+
+
+async def load_test(host, port, hits, concurrency, distinct):
+    counter = [0]
+    init_db()
+    signer = tracking_signer()
+    tids = [signer.sign(i % distinct + 1, "initial", 0) for i in range(hits)]
+    chunks = [tids[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(_load_worker(host, port, chunk, counter) for chunk in chunks))
+    elapsed = time.perf_counter() - started
+    print(f"{counter[0]} hits in {elapsed:.2f}s -> {counter[0] / elapsed:.0f} hits/s "
+          f"({concurrency} connections, {distinct} distinct tids)")
+
+
+# =========================
+# CLI
+# =========================
+
+def print_usage():
+    print("Usage:")
+    print("  python tracking_server.py serve [port]")
+    print("  python tracking_server.py loadtest [hits] [concurrency] [host:port]")
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "serve"
+
+    if cmd == "serve":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else TRACKER_PORT
+        asyncio.run(serve(port=port))
+    elif cmd == "loadtest":
+        hits = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+        concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+        target = sys.argv[4] if len(sys.argv) > 4 else f"127.0.0.1:{TRACKER_PORT}"
+        host, port = target.rsplit(":", 1)
+        asyncio.run(load_test(host, int(port), hits, concurrency, distinct=max(1, hits // 4)))
+    else:
+        print_usage()
@@ -0,0 +1,109 @@
+import json
+import re
+from functools import lru_cache
+
+
+# =========================
+# Vertical classifier
+# =========================
+#
+# Rules live in verticals.json as {vertical: {keyword: weight}}. All keywords
+# are compiled into one regex that runs once over the tokenised domain
+# (labels split on punctuation, digits and camelCase). Longer keywords match
+# anywhere in a token; keywords shorter than min_substring_length only match
+# at the start or end of one (a plural "s" is allowed), so "ai" matches
+# "openai" and "aitools" and "bed" matches "smartbed" but not "chair" or
+# "repair". Words that merely begin or end with a short keyword ("airline",
+# "thai", "bedrock") are listed under "stopwords" and are cut off a token
+# before matching; a token made up entirely of keywords ("aicloud") is
+# split into them first. The vertical with the highest total weight wins;
+# ties go to the one listed first.
+
+TOKEN_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize_domain(domain_name):
+    labels = domain_name.strip().split(".")
+    if len(labels) > 1:
+        labels = labels[:-1]  # the TLD says nothing about the business
+    return [token.lower() for label in labels for token in TOKEN_RE.findall(label)]
+
+
+class VerticalClassifier:
+    def __init__(self, verticals, default="local", min_substring_length=4, stopwords=(),
+                 cache_size=100000):
+        self.default = default
+        self.order = {vertical: i for i, vertical in enumerate(verticals)}
+        self.keywords = {}
+        for vertical, keywords in verticals.items():
+            for keyword, weight in keywords.items():
+                self.keywords.setdefault(keyword.lower(), []).append((vertical, weight))
+        # longest first, so a long stopword is cut before a shorter one inside it
+        self.stopwords = sorted({word.lower() for word in stopwords}, key=len, reverse=True)
+
+        alternatives = []
+        for keyword in sorted(self.keywords, key=len, reverse=True):
+            escaped = re.escape(keyword)
+            if len(keyword) >= min_substring_length:
+                alternatives.append(escaped)
+            else:
+                alternatives.append(rf"(?<![a-z0-9]){escaped}|{escaped}(?=s?(?![a-z0-9]))")
+        self.pattern = re.compile("|".join(alternatives)) if alternatives else None
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+        self._segment = lru_cache(maxsize=cache_size)(self._segment_token)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(
+            config.get("verticals", {}),
+            default=config.get("default", "local"),
+            min_substring_length=config.get("min_substring_length", 4),
+            stopwords=config.get("stopwords", ()),
+        )
+
+    def _segment_token(self, token):
+        # the keywords that make up all of token, or None if it is not
+        # made of keywords alone
+        if token in self.keywords:
+            return (token,)
+        for end in range(len(token) - 1, 0, -1):
+            if token[:end] in self.keywords:
+                rest = self._segment(token[end:])
+                if rest is not None:
+                    return (token[:end],) + rest
+        return None
+
+    def _strip_stopwords(self, token):
+        # "airline" -> "line", "bestthai" -> "best", "airbed" -> "bed"
+        for word in self.stopwords:
+            if token.startswith(word):
+                token = token[len(word):]
+            if token.endswith(word):
+                token = token[:-len(word)]
+        return token
+
+    def _tokens(self, domain_name):
+        for token in tokenize_domain(domain_name):
+            segments = self._segment(token)
+            if segments:
+                yield from segments
+            else:
+                token = self._strip_stopwords(token)
+                if token:
+                    yield token
+
+    def _classify(self, domain_name):
+        if self.pattern is None:
+            return self.default
+        scores = {}
+        for m in self.pattern.finditer(" ".join(self._tokens(domain_name))):
+            for vertical, weight in self.keywords[m.group()]:
+                scores[vertical] = scores.get(vertical, 0) + weight
+        if not scores:
+            return self.default
+        return max(scores, key=lambda v: (scores[v], -self.order[v]))
+
+    def classify_many(self, domain_names):
+        return [self.classify(domain_name) for domain_name in domain_names]